@@ -0,0 +1,34 @@
+# Times netlist construction: PySpice element objects (one Unit per component, the
+# previous approach) against services/circuit_builder.py (registry + bulk SPICE text).
+# Run from the backend directory:  python -m benchmarks.bench_circuit_builder
+#
+# Both sides include rendering the netlist to text, which is what ngspice receives.
+
+from PySpice.Spice.Netlist import Circuit
+import PySpice.Unit as Unit
+
+from benchmarks.bench_dc_engines import resistor_mesh, best_of
+from services.circuit_builder import build_circuit, si_value
+
+
+def pyspice_elements(components):
+    circuit = Circuit("Generated Circuit")
+    for comp in components:
+        if comp.type == "R":
+            circuit.R(comp.name, comp.node1, comp.node2, si_value(comp.value, comp.prefix) @ Unit.u_Ohm)
+        else:
+            circuit.V(comp.name, comp.node1, comp.node2, si_value(comp.value, comp.prefix) @ Unit.u_V)
+    return str(circuit)
+
+
+def run():
+    print(f"{'elements':>9} {'pyspice (ms)':>13} {'registry (ms)':>14}")
+    for n in (100, 1_000, 10_000, 100_000):
+        components = resistor_mesh(n)
+        elements = best_of(lambda: pyspice_elements(components), repeat=1)
+        registry = best_of(lambda: str(build_circuit(components)))
+        print(f"{len(components):>9} {elements * 1e3:>13.2f} {registry * 1e3:>14.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+# Stored size of saved circuits: the plain CircuitCreate dump (one BSON document per
+# save, as before) vs the encoded snapshot and a one-component re-save delta.
+# Run from the backend directory:  python -m benchmarks.bench_circuit_storage
+import sys
+import time
+
+import bson
+
+import services.circuit_store as circuit_store
+from utils.circuit_codec import decode_circuit
+
+
+def schematic(n_components):
+    # resistor chain laid out on a grid, every wire a short orthogonal polyline
+    components = []
+    wires = []
+    for i in range(n_components):
+        x, y = 40.0 * (i % 50), 80.0 * (i // 50)
+        components.append({
+            "id": f"resistor-{i}", "type": "resistor", "x": x, "y": y, "rotation": 0.0,
+            "value": 1000.0, "title": f"R{i}",
+            "connections": {"left": [f"wire-{i - 1}"] if i else [], "right": [f"wire-{i}"]},
+        })
+        wires.append({
+            "id": f"wire-{i}",
+            "from_": {"componentId": f"resistor-{i}", "pinId": "right"},
+            "to": {"componentId": f"resistor-{i + 1}", "pinId": "left"},
+            "points": [x + 25, y, x + 30, y, x + 30, y + 10, x + 40, y + 10],
+            "color": "#000000",
+        })
+    return components, wires
+
+
+def run(sizes=(100, 1_000, 10_000)):
+    print(f"{'components':>10} {'plain (kB)':>11} {'encoded (kB)':>13} {'delta (B)':>10} {'decode (ms)':>12}")
+    for n in sizes:
+        components, wires = schematic(n)
+        plain = len(bson.encode({"components": components, "wires": wires}))
+        snapshot = circuit_store.snapshot_fields(components, wires)
+
+        moved = [dict(comp) for comp in components]
+        moved[n // 2]["x"] += 10
+        delta = circuit_store.make_delta(components, wires, moved, wires, 2)
+
+        start = time.perf_counter()
+        decode_circuit(snapshot["circuit"])
+        elapsed = time.perf_counter() - start
+        print(f"{n:>10} {plain / 1e3:>11.1f} {len(snapshot['circuit']) / 1e3:>13.1f} "
+              f"{len(bson.encode(delta)):>10} {elapsed * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    run(tuple(int(arg) for arg in sys.argv[1:]) or (100, 1_000, 10_000))
@@ -0,0 +1,65 @@
+# Compares the native MNA DC engine (services/mna.py) with ngspice on resistor meshes.
+# Run from the backend directory:  python -m benchmarks.bench_dc_engines [max_ngspice_nodes]
+#
+# A square grid of 1 kOhm resistors driven by a 10 V source at one corner, from 10 to
+# 100k nodes. ngspice is only timed up to max_ngspice_nodes (default 10k) and is
+# skipped entirely when the shared library is not installed.
+import math
+import sys
+import time
+
+from model.circuit import SimComponent
+import services.mna as mna
+import services.simulation as sim
+
+
+def resistor_mesh(n_nodes):
+    side = max(2, int(math.isqrt(n_nodes)))
+    name = lambda r, c: f"N{r * side + c + 1}"
+    components = [SimComponent(type="V", name="V1", node1=name(0, 0), node2="0", value=10, unit="volt", prefix="")]
+    count = 0
+    for r in range(side):
+        for c in range(side):
+            if c + 1 < side:
+                count += 1
+                components.append(SimComponent(type="R", name=f"R{count}", node1=name(r, c), node2=name(r, c + 1),
+                                               value=1, unit="ohm", prefix="k"))
+            if r + 1 < side:
+                count += 1
+                components.append(SimComponent(type="R", name=f"R{count}", node1=name(r, c), node2=name(r + 1, c),
+                                               value=1, unit="ohm", prefix="k"))
+    count += 1
+    components.append(SimComponent(type="R", name=f"R{count}", node1=name(side - 1, side - 1), node2="0",
+                                   value=1, unit="ohm", prefix="k"))
+    return components
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(max_ngspice_nodes=10_000):
+    try:
+        sim.simulate_DC_ngspice(resistor_mesh(4))
+        have_ngspice = True
+    except OSError:
+        have_ngspice = False
+        print("ngspice shared library not found, timing the native engine only")
+
+    print(f"{'nodes':>8} {'elements':>9} {'native (ms)':>12} {'ngspice (ms)':>13}")
+    for n in (10, 100, 1_000, 10_000, 100_000):
+        components = resistor_mesh(n)
+        native = best_of(lambda: mna.solve_dc(components, sim.prefix_map))
+        ngspice = "-"
+        if have_ngspice and n <= max_ngspice_nodes:
+            ngspice = f"{best_of(lambda: sim.simulate_DC_ngspice(components), repeat=1) * 1e3:.2f}"
+        print(f"{n:>8} {len(components):>9} {native * 1e3:>12.2f} {ngspice:>13}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,63 @@
+# Times the post-processing of an ngspice operating point (node voltages + element
+# currents) on resistor meshes: the previous per-component loop, a one-off
+# DCExtractor (build + extract) and extract() on an existing extractor, which is what
+# every point of an ngspice sweep or Monte Carlo run pays.
+# Run from the backend directory:  python -m benchmarks.bench_dc_extraction
+#
+# The analysis is synthesised from the native MNA solution, so ngspice is not needed.
+import numpy as np
+
+from benchmarks.bench_dc_engines import resistor_mesh, best_of
+import services.mna as mna
+import services.simulation as sim
+
+
+class OperatingPoint:
+    # Stand-in for PySpice's OperatingPoint: one length-1 array per node and branch
+    def __init__(self, components):
+        result = mna.solve_dc(components, sim.prefix_map)
+        self.nodes = {node: np.array([v]) for node, v in result["node_voltages"].items()}
+        self.branches = {
+            "v" + name.lower(): np.array([-i]) for name, i in result["component_currents"].items() if name.startswith("V")
+        }
+
+
+def loop_extraction(components, analysis):
+    results = {}
+    for node in analysis.nodes.values():
+        results[len(results)] = float(node.item())
+    results = dict(zip(analysis.nodes, results.values()))
+
+    component_currents = {}
+    for comp in components:
+        if comp.type == "R":
+            V1 = results.get(str(comp.node1).lower(), 0.0)
+            V2 = results.get(str(comp.node2).lower(), 0.0)
+            R_value = comp.value * sim.prefix_map.get(comp.prefix or "", 1)
+            component_currents[comp.name] = 0.0 if R_value == 0 else (V1 - V2) / R_value
+        elif comp.type == "V":
+            try:
+                component_currents[comp.name] = -float(analysis.branches["v" + comp.name.lower()][0])
+            except Exception:
+                component_currents[comp.name] = None
+    return {"node_voltages": results, "component_currents": component_currents}
+
+
+def run():
+    print(f"{'elements':>9} {'loop (ms)':>10} {'build+extract (ms)':>19} {'extract (ms)':>13}")
+    for n in (1_000, 10_000, 50_000, 100_000):
+        components = resistor_mesh(n)
+        analysis = OperatingPoint(components)
+        extractor = sim.DCExtractor(components)
+        assert np.allclose(
+            list(loop_extraction(components, analysis)["component_currents"].values()),
+            list(extractor.extract(analysis)["component_currents"].values()),
+        )
+        loop = best_of(lambda: loop_extraction(components, analysis))
+        one_off = best_of(lambda: sim.DCExtractor(components).extract(analysis))
+        reused = best_of(lambda: extractor.extract(analysis))
+        print(f"{len(components):>9} {loop * 1e3:>10.2f} {one_off * 1e3:>19.2f} {reused * 1e3:>13.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,38 @@
+# One resistor edit on generated resistor ladders: full re-run (translate + MNA solve,
+# what /simulate/test does) vs PATCH /simulate/session (low-rank update of the kept LU).
+# Run from the backend directory:  python -m benchmarks.bench_dc_session
+import sys
+import time
+
+from benchmarks.bench_translation import ladder_circuit
+from services.circuit_builder import prefix_map
+from services.dc_session import DCSession
+from services.mna import solve_dc
+from utils.translation import convert_frontend_to_netlist
+
+
+def run(sizes=(1_000, 10_000, 100_000), edits=20):
+    print(f"{'wires':>8} {'full (ms)':>10} {'session (ms)':>13} {'speedup':>8}")
+    for n in sizes:
+        data = ladder_circuit(3 * (n // 3) + 1)  # whole ladder sections only
+        resistor = next(comp for comp in data["components"] if comp["type"] == "resistor")
+
+        start = time.perf_counter()
+        for k in range(edits):
+            resistor["value"] = 100 + k
+            solve_dc(convert_frontend_to_netlist(data)["components"], prefix_map)
+        full = (time.perf_counter() - start) / edits
+
+        translation = convert_frontend_to_netlist(data)
+        session = DCSession(translation["components"])
+        name = translation["components_mapping"][resistor["id"]]
+        start = time.perf_counter()
+        for k in range(edits):
+            session.apply({name: (200 + k, "")})
+        incremental = (time.perf_counter() - start) / edits
+
+        print(f"{n:>8} {full * 1e3:>10.2f} {incremental * 1e3:>13.2f} {full / incremental:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run(tuple(int(arg) for arg in sys.argv[1:]) or (1_000, 10_000, 100_000))
@@ -0,0 +1,99 @@
+# Benchmark for repeated stages: copy-pasted flat circuits vs one subcircuit definition.
+# Run from the backend directory:  python -m benchmarks.bench_subcircuits
+#
+# Each stage is an RC low-pass (series R, shunt C, shunt R). Prints the request payload
+# size, translation time and netlist size of both forms for 100 .. 10k stages; the
+# subcircuit form should stay a few times smaller in every column.
+import json
+import sys
+import time
+
+from utils.translation import convert_frontend_to_netlist
+from services.circuit_builder import netlist_lines
+
+
+def _component(comp_id, comp_type, pins, value=None, **fields):
+    return {"id": comp_id, "type": comp_type, "value": value, "connections": {pin: [] for pin in pins}, **fields}
+
+
+def _wire(a, a_pin, b, b_pin):
+    return {"from": {"componentId": a, "pinId": a_pin}, "to": {"componentId": b, "pinId": b_pin}}
+
+
+def _stage(prefix, ground):
+    # -> (components, wires, input pin, output pin)
+    rs, c, rp = f"{prefix}rs", f"{prefix}c", f"{prefix}rp"
+    components = [
+        _component(rs, "resistor", ["left", "right"], 1000),
+        _component(c, "capacitor", ["top", "bottom"], 1e-6),
+        _component(rp, "resistor", ["top", "bottom"], 10000),
+    ]
+    wires = [
+        _wire(rs, "right", c, "top"),
+        _wire(rs, "right", rp, "top"),
+        _wire(c, "bottom", ground, "top"),
+        _wire(rp, "bottom", ground, "top"),
+    ]
+    return components, wires, (rs, "left"), (rs, "right")
+
+
+def _chain(n_stages, add_stage):
+    components = [_component("gnd", "ground", ["top"]), _component("v1", "voltageSource", ["top", "bottom"], 5)]
+    wires = [_wire("v1", "bottom", "gnd", "top")]
+    prev = ("v1", "top")
+    for i in range(n_stages):
+        stage_in, stage_out = add_stage(i, components, wires)
+        wires.append(_wire(*prev, *stage_in))
+        prev = stage_out
+    return components, wires
+
+
+def flat_circuit(n_stages):
+    def add_stage(i, components, wires):
+        stage_components, stage_wires, stage_in, stage_out = _stage(f"s{i}", "gnd")
+        components.extend(stage_components)
+        wires.extend(stage_wires)
+        return stage_in, stage_out
+
+    components, wires = _chain(n_stages, add_stage)
+    return {"components": components, "wires": wires}
+
+
+def subcircuit_circuit(n_stages):
+    stage_components, stage_wires, stage_in, stage_out = _stage("", "g")
+    definition = {
+        "ports": [{"name": "inp", "componentId": stage_in[0], "pinId": stage_in[1]},
+                  {"name": "out", "componentId": stage_out[0], "pinId": stage_out[1]}],
+        "components": [_component("g", "ground", ["top"]), *stage_components],
+        "wires": stage_wires,
+    }
+
+    def add_stage(i, components, wires):
+        components.append(_component(f"x{i}", "subcircuit", ["inp", "out"], subcircuit="lowpass"))
+        return (f"x{i}", "inp"), (f"x{i}", "out")
+
+    components, wires = _chain(n_stages, add_stage)
+    return {"components": components, "wires": wires, "subcircuits": {"lowpass": definition}}
+
+
+def _measure(data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        translation = convert_frontend_to_netlist(data)
+        best = min(best, time.perf_counter() - start)
+    netlist = "\n".join(netlist_lines(translation["components"]))
+    return len(json.dumps(data)), best, len(netlist)
+
+
+def run(sizes=(100, 1_000, 10_000), repeat=3):
+    print(f"{'stages':>7} {'form':>11} {'payload (kB)':>13} {'translate (ms)':>15} {'netlist (kB)':>13}")
+    for n in sizes:
+        for form, build in (("flat", flat_circuit), ("subcircuit", subcircuit_circuit)):
+            payload, seconds, netlist = _measure(build(n), repeat)
+            print(f"{n:>7} {form:>11} {payload / 1024:>13.1f} {seconds * 1e3:>15.2f} {netlist / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (100, 1_000, 10_000)
+    run(sizes)
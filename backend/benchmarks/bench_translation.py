@@ -0,0 +1,50 @@
+# Benchmark for convert_frontend_to_netlist on generated resistor ladders.
+# Run from the backend directory:  python -m benchmarks.bench_translation
+#
+# Prints time per wire for 100 .. 100k wires. With the union-find net builder the
+# per-wire cost should stay roughly flat (near-linear scaling overall).
+import sys
+import time
+
+from utils.translation import convert_frontend_to_netlist
+
+
+def ladder_circuit(n_wires):
+    # V1 -> ladder of series/shunt resistors -> ground, every pin joined by one wire
+    components = [
+        {"id": "gnd", "type": "ground", "value": None, "connections": {"top": []}},
+        {"id": "v1", "type": "voltageSource", "value": 5, "connections": {"top": [], "bottom": []}},
+    ]
+    wires = [
+        {"from": {"componentId": "v1", "pinId": "bottom"}, "to": {"componentId": "gnd", "pinId": "top"}},
+    ]
+    prev = ("v1", "top")
+    i = 0
+    while len(wires) < n_wires:
+        series = f"rs{i}"
+        shunt = f"rp{i}"
+        components.append({"id": series, "type": "resistor", "value": 100, "connections": {"left": [], "right": []}})
+        components.append({"id": shunt, "type": "resistor", "value": 1000, "connections": {"top": [], "bottom": []}})
+        wires.append({"from": {"componentId": prev[0], "pinId": prev[1]}, "to": {"componentId": series, "pinId": "left"}})
+        wires.append({"from": {"componentId": series, "pinId": "right"}, "to": {"componentId": shunt, "pinId": "top"}})
+        wires.append({"from": {"componentId": shunt, "pinId": "bottom"}, "to": {"componentId": "gnd", "pinId": "top"}})
+        prev = (series, "right")
+        i += 1
+    return {"components": components, "wires": wires[:n_wires]}
+
+
+def run(sizes=(100, 1_000, 10_000, 100_000), repeat=3):
+    print(f"{'wires':>8} {'components':>11} {'best (ms)':>10} {'us/wire':>8}")
+    for n in sizes:
+        data = ladder_circuit(n)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            convert_frontend_to_netlist(data)
+            best = min(best, time.perf_counter() - start)
+        print(f"{n:>8} {len(data['components']):>11} {best * 1e3:>10.2f} {best / n * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (100, 1_000, 10_000, 100_000)
+    run(sizes)
@@ -0,0 +1,101 @@
+# Concurrent-request load test for the Mongo access pattern of the auth/list routes,
+# blocking pymongo calls inside async handlers (before) vs the Motor layer (after).
+# Run from the backend directory against a disposable database:
+#   MONGO_URI=mongodb://localhost:27017 python -m benchmarks.load_test_db [concurrency] [seconds]
+#
+# Every simulated request does what an authenticated /simulate/list does: look the
+# user up by username, then fetch one page of circuit summaries. A heartbeat task
+# measures how long the event loop is stalled, which is what every other in-flight
+# request (including simulation polling) experiences.
+import asyncio
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
+
+DATABASE = "FEMspice_loadtest"
+USERS = 50
+CIRCUITS_PER_USER = 200
+
+
+def seed(uri):
+    db = MongoClient(uri)[DATABASE]
+    db.users.drop()
+    db.simulations.drop()
+    user_ids = db.users.insert_many([{"username": f"user{i}", "hashed_password": "x"} for i in range(USERS)]).inserted_ids
+    now = datetime.datetime.utcnow()
+    db.simulations.insert_many([
+        {"user_id": uid, "name": f"circuit {k}", "description": "", "created_at": now - datetime.timedelta(seconds=k),
+         "components": [{"id": str(n), "type": "resistor", "value": 1} for n in range(50)], "wires": []}
+        for uid in user_ids for k in range(CIRCUITS_PER_USER)
+    ])
+    db.users.create_index([("username", ASCENDING)], unique=True)
+    db.simulations.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+
+
+def blocking_handler(db):
+    async def handle(i):
+        user = db.users.find_one({"username": f"user{i % USERS}"})
+        return list(db.simulations.find({"user_id": user["_id"]}, {"name": 1, "description": 1, "created_at": 1})
+                    .sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(51))
+    return handle
+
+
+def motor_handler(db):
+    async def handle(i):
+        user = await db.users.find_one({"username": f"user{i % USERS}"})
+        return await (db.simulations.find({"user_id": user["_id"]}, {"name": 1, "description": 1, "created_at": 1})
+                      .sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(51).to_list(51))
+    return handle
+
+
+async def drive(handle, concurrency, seconds):
+    latencies = []
+    stalls = []
+    deadline = time.perf_counter() + seconds
+
+    async def worker(w):
+        i = w
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await handle(i)
+            latencies.append(time.perf_counter() - start)
+            i += concurrency
+
+    async def heartbeat():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - start - 0.005)
+
+    await asyncio.gather(heartbeat(), *(worker(w) for w in range(concurrency)))
+    latencies = np.array(latencies) * 1e3
+    return len(latencies) / seconds, np.percentile(latencies, 50), np.percentile(latencies, 95), max(stalls) * 1e3
+
+
+def run(concurrency=64, seconds=10):
+    uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    seed(uri)
+    print(f"{concurrency} concurrent requests, {seconds} s each")
+    print(f"{'driver':>8} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'max loop stall (ms)':>20}")
+
+    sync_db = MongoClient(uri, maxPoolSize=100)[DATABASE]
+    result = asyncio.run(drive(blocking_handler(sync_db), concurrency, seconds))
+    print(f"{'pymongo':>8} {result[0]:>8.0f} {result[1]:>9.1f} {result[2]:>9.1f} {result[3]:>20.1f}")
+
+    async def with_motor():
+        motor_db = AsyncIOMotorClient(uri, maxPoolSize=100)[DATABASE]
+        return await drive(motor_handler(motor_db), concurrency, seconds)
+
+    result = asyncio.run(with_motor())
+    print(f"{'motor':>8} {result[0]:>8.0f} {result[1]:>9.1f} {result[2]:>9.1f} {result[3]:>20.1f}")
+
+    MongoClient(uri).drop_database(DATABASE)
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -1,16 +1,79 @@
-
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import AutoReconnect, NetworkTimeout, ServerSelectionTimeoutError
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
 
+from config import settings
+
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 
-client = MongoClient(MONGO_URI)
+# Motor client: every call is awaited on the event loop instead of blocking it.
+# Pool size and timeouts come from config/settings.py; writes use the driver's
+# retryable writes, reads can go through with_retry() below.
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+    minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+    serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+    waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    retryWrites=True,
+    retryReads=True,
+)
 
 db = client.FEMspice
 users_collection = db["users"]
 simulations_collection = db["simulations"]
+results_collection = db["results"]
+jobs_collection = db["jobs"]
+
+logger = logging.getLogger(__name__)
+
+
+async def with_retry(operation):
+    # Await operation() again on transient network errors (primary step-down, dropped
+    # connection, socket timeout) with exponential backoff. Only for idempotent calls.
+    # No server reachable at all is not retried: that already took the selection timeout.
+    attempts = max(1, settings.MONGO_RETRY_ATTEMPTS)
+    for attempt in range(attempts):
+        try:
+            return await operation()
+        except ServerSelectionTimeoutError:
+            raise
+        except (AutoReconnect, NetworkTimeout):
+            if attempt + 1 == attempts:
+                raise
+            logger.warning("Transient MongoDB error, retrying (%d/%d)", attempt + 1, attempts - 1)
+            await asyncio.sleep(settings.MONGO_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+
+async def ping():
+    await client.admin.command("ping")
+
 
+# name -> (collection, keys, options); created at startup, creating an existing index is a no-op
+INDEXES = {
+    # per-user listing, newest first, (created_at, _id) keyset pagination
+    "user_created": (simulations_collection, [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+    "username_unique": (users_collection, [("username", ASCENDING)], {"unique": True}),
+    # persisted simulation results (services/result_store.py) expire on their own
+    "result_expiry": (results_collection, [("created_at", ASCENDING)], {"expireAfterSeconds": settings.RESULT_STORE_TTL_SECONDS}),
+    # job dispatch order (services/jobs.py); finished jobs carry expires_at and are removed then
+    "job_queue": (jobs_collection, [("status", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING)], {}),
+    "job_expiry": (jobs_collection, [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+}
 
 
+async def ensure_indexes():
+    for name, (collection, keys, options) in INDEXES.items():
+        try:
+            await collection.create_index(keys, name=name, **options)
+        except Exception:
+            # e.g. duplicate usernames already stored: keep serving, log for the operator
+            logger.exception("Could not create index %s on %s", name, collection.name)
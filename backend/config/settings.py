@@ -0,0 +1,107 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Translation / result caches (see utils/cache.py)
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "512"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "600"))
+# authenticated user records (routers/auth.py); the TTL bounds how long a changed user can be served stale
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Simulation worker pool (see services/executor.py); SIM_WORKERS=0 means one per CPU
+SIM_WORKERS = int(os.getenv("SIM_WORKERS", "0"))
+SIM_QUEUE_DEPTH = int(os.getenv("SIM_QUEUE_DEPTH", "32"))
+SIM_TIMEOUT_SECONDS = float(os.getenv("SIM_TIMEOUT_SECONDS", "60"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+# worker processes (and their warm ngspice session) are replaced after this many jobs, 0 = never
+SIM_RECYCLE_AFTER = int(os.getenv("SIM_RECYCLE_AFTER", "500"))
+
+# Streaming transient runs (see services/streaming.py)
+STREAM_BLOCK_SIZE = int(os.getenv("STREAM_BLOCK_SIZE", "256"))
+STREAM_MAX_BLOCKS = int(os.getenv("STREAM_MAX_BLOCKS", "8"))
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "0.02"))
+# ngspice instance id of the streaming runs; ids other than 0 load libngspice<id>.so unless
+# STREAM_NGSPICE_LIBRARY gives the library path
+STREAM_NGSPICE_ID = int(os.getenv("STREAM_NGSPICE_ID", "0"))
+STREAM_NGSPICE_LIBRARY = os.getenv("STREAM_NGSPICE_LIBRARY") or None
+
+# Transient planning (see services/transient_plan.py): output points per run, internal
+# steps per fastest time constant (and their cap), default ngspice reltol and method
+TRANSIENT_MAX_POINTS = int(os.getenv("TRANSIENT_MAX_POINTS", "100000"))
+TRANSIENT_STEPS_PER_TAU = float(os.getenv("TRANSIENT_STEPS_PER_TAU", "20"))
+TRANSIENT_MAX_INTERNAL_STEPS = int(os.getenv("TRANSIENT_MAX_INTERNAL_STEPS", "1000000"))
+TRANSIENT_RELTOL = float(os.getenv("TRANSIENT_RELTOL", "1e-3"))
+TRANSIENT_METHOD = os.getenv("TRANSIENT_METHOD", "trap")
+
+# DC operating point engine: "auto" (native MNA, ngspice fallback), "native" or "ngspice"
+DC_ENGINE = os.getenv("DC_ENGINE", "auto")
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", "10000"))
+
+# /simulate/batch: most circuits accepted in one request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# Background jobs (see services/jobs.py): JOB_BACKEND = "memory" or "mongo";
+# JOB_CONCURRENCY=0 means one running job per simulation worker
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "0"))
+JOB_USER_CONCURRENCY = int(os.getenv("JOB_USER_CONCURRENCY", "2"))
+# queued + running jobs one user may have
+JOB_USER_MAX_PENDING = int(os.getenv("JOB_USER_MAX_PENDING", "20"))
+JOB_MAX_PRIORITY = int(os.getenv("JOB_MAX_PRIORITY", "9"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_RESULT_MAX_BYTES = int(os.getenv("JOB_RESULT_MAX_BYTES", str(15 * 1024 * 1024)))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+# Incremental DC sessions (see services/dc_session.py): open sessions kept in memory, idle
+# lifetime, and how many edited resistors are solved as a low-rank update before refactorizing
+DC_SESSION_MAX = int(os.getenv("DC_SESSION_MAX", "64"))
+DC_SESSION_TTL_SECONDS = float(os.getenv("DC_SESSION_TTL_SECONDS", "1800"))
+DC_SESSION_MAX_UPDATES = int(os.getenv("DC_SESSION_MAX_UPDATES", "16"))
+AC_MAX_POINTS = int(os.getenv("AC_MAX_POINTS", "100000"))
+
+# Monte Carlo tolerance analysis (see services/montecarlo.py)
+MC_MAX_SAMPLES = int(os.getenv("MC_MAX_SAMPLES", "100000"))
+MC_MAX_TRANSIENT_SAMPLES = int(os.getenv("MC_MAX_TRANSIENT_SAMPLES", "2000"))
+MC_CHUNK_SIZE = int(os.getenv("MC_CHUNK_SIZE", "1000"))
+MC_TRANSIENT_CHUNK_SIZE = int(os.getenv("MC_TRANSIENT_CHUNK_SIZE", "16"))
+MC_TRANSIENT_POINTS = int(os.getenv("MC_TRANSIENT_POINTS", "500"))
+# MNA systems up to this size are solved as one stacked dense batch per chunk
+MC_DENSE_MAX_SIZE = int(os.getenv("MC_DENSE_MAX_SIZE", "128"))
+
+# /simulate/list pagination
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "200"))
+
+# Saved circuits (see services/circuit_store.py): re-saves are stored as deltas until
+# there are this many, or they outgrow the snapshot, then folded into a new snapshot
+CIRCUIT_MAX_DELTAS = int(os.getenv("CIRCUIT_MAX_DELTAS", "32"))
+
+# Persisted simulation results (see services/result_store.py); RESULT_STORE_ENABLED=0 turns it off
+RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "1") != "0"
+RESULT_STORE_TTL_SECONDS = int(os.getenv("RESULT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+# compressed results larger than this are only kept in the in-memory cache
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(8 * 1024 * 1024)))
+# after a connection failure the store is skipped for this long
+RESULT_STORE_RETRY_SECONDS = float(os.getenv("RESULT_STORE_RETRY_SECONDS", "30"))
+
+# MongoDB client (see config/db.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+# how long a request may wait for a free pooled connection
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_RETRY_ATTEMPTS = int(os.getenv("MONGO_RETRY_ATTEMPTS", "3"))
+MONGO_RETRY_BACKOFF_SECONDS = float(os.getenv("MONGO_RETRY_BACKOFF_SECONDS", "0.1"))
+
+# Password hashing (see utils/security.py). Changing BCRYPT_ROUNDS rehashes passwords on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_CRYPTO_WORKERS = int(os.getenv("AUTH_CRYPTO_WORKERS", "4"))
+AUTH_CRYPTO_MAX_PENDING = int(os.getenv("AUTH_CRYPTO_MAX_PENDING", "32"))
+AUTH_CRYPTO_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AUTH_CRYPTO_QUEUE_TIMEOUT_SECONDS", "5"))
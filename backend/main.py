@@ -1,19 +1,17 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware  
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
-from config.db import users_collection, simulations_collection, client
+from pymongo.errors import ConnectionFailure
+from config.db import client, ping, ensure_indexes
 from typing import Annotated
-from routers import auth, simulate
-
-# Send a ping to confirm a successful connection
-try:
-    client.admin.command('ping')
-    print("Pinged your deployment. You successfully connected to MongoDB!")
-except Exception as e:
-    print(e)
-
+from routers import auth, simulate, jobs
+import utils.metrics as metrics
+from contextlib import asynccontextmanager
+from services.executor import simulation_executor
+from services.jobs import job_queue
+from utils.security import CryptoBusyError
+from utils.preflight import InvalidCircuit
 
 ## CORS Settings
 origins = [
@@ -23,7 +21,23 @@ origins = [
 ]
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Send a ping to confirm a successful connection
+    try:
+        await ping()
+        print("Pinged your deployment. You successfully connected to MongoDB!")
+        await ensure_indexes()
+    except Exception as e:
+        print(e)
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    simulation_executor.shutdown()
+    client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,10 +45,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Original-Points", "X-Decimated-Points", "X-Output-Step", "X-Max-Step",
+                    "X-Transient-Reltol", "X-Transient-Method", "X-Step-Limited"],
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 app.include_router(auth.router)
 app.include_router(simulate.router)
+app.include_router(jobs.router)
+
+
+@app.exception_handler(ConnectionFailure)
+async def database_unavailable(request: Request, exc: ConnectionFailure):
+    # Mongo unreachable / pool wait timed out: tell the client to retry instead of a bare 500
+    return JSONResponse(status_code=503, content={"detail": "Database unavailable, please try again shortly."})
+
+
+@app.exception_handler(CryptoBusyError)
+async def auth_busy(request: Request, exc: CryptoBusyError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(InvalidCircuit)
+async def invalid_circuit(request: Request, exc: InvalidCircuit):
+    # preflight rejection (utils/preflight.py): the message plus one diagnostic per offending component
+    return JSONResponse(status_code=400, content={"detail": str(exc), "diagnostics": exc.diagnostics})
+
 
+@app.get("/metrics")
+async def read_metrics():
+    return metrics.snapshot()
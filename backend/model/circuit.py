@@ -4,8 +4,8 @@ from typing import List, Optional, Tuple, Dict
 class SimComponent(BaseModel):
     type: str         # "R", "V", "C", etc.
     name: str         # "R1", "V1", etc.
-    node1: str
-    node2: str
+    node1: Optional[str]     # None: unconnected pin, rejected by utils/preflight.py
+    node2: Optional[str]
     value: float      # resistance in ohms, voltage in volts, etc.
     unit : str       # "ohm", "volt", "farad", etc.
     prefix: str         # "k", "M", "m", "u", etc.
@@ -15,6 +15,25 @@ class SimComponent(BaseModel):
     pulse_value: float = None
     pulse_width: float = None
     period: float = None
+    ac_magnitude: float = None   # small-signal amplitude for AC analysis (V and I sources)
+    ac_phase: float = None       # degrees
+    # elements with more than two pins (E, G, X): every node in SPICE order, node1/node2 are the first two
+    nodes: Optional[List[Optional[str]]] = None
+    subcircuit: Optional["SubcircuitDef"] = None   # X: the instantiated definition
+
+    @property
+    def terminals(self):
+        return self.nodes if self.nodes is not None else [self.node1, self.node2]
+
+
+class SubcircuitDef(BaseModel):
+    # emitted once as .subckt <name> <ports...>, shared by every X instance
+    name: str
+    ports: List[str]
+    components: List[SimComponent]
+
+
+SimComponent.model_rebuild()
 
 
 class SimulationRequest(BaseModel):
@@ -1,15 +1,21 @@
 from pydantic import BaseModel
 from model.user import User, UserPublic
-from config.db import users_collection
+from config.db import users_collection, with_retry
+from pymongo.errors import DuplicateKeyError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi import Depends, HTTPException, status, APIRouter
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Optional
 import jwt
+import logging
 import os
 from dotenv import load_dotenv
 from schema.schemas import individual_serialize
-from utils.security import hash_password, verify_password
+from utils.security import hash_password_async, verify_password_async, needs_rehash
+from utils.cache import LRUTTLCache
+from config import settings
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -21,6 +27,17 @@ router = APIRouter(
 )
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/login")
+# same scheme for routes that also work anonymously: no token gives None instead of a 401
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+# Serialized users (without the password hash) keyed by the token's user id, so
+# authenticated calls skip the Mongo lookup. Anything that changes or deletes a
+# user document must call invalidate_user(); the TTL bounds staleness otherwise.
+user_cache = LRUTTLCache("users", settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: str):
+    user_cache.invalidate(user_id)
 
 class CreateUserRequest(BaseModel):
     username: str
@@ -35,27 +52,44 @@ class Token(BaseModel):
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(userReq: CreateUserRequest):
-    if users_collection.find_one({"username": userReq.username}):
+    if await with_retry(lambda: users_collection.find_one({"username": userReq.username}, {"_id": 1})):
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_password = hash_password(userReq.password)
+    hashed_password = await hash_password_async(userReq.password)
     user_dict = {
         "username": userReq.username,
         "hashed_password": hashed_password,
         "email": userReq.email,
         "full_name": userReq.full_name
     }
-    users_collection.insert_one(user_dict)
+    try:
+        await users_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        # concurrent registration of the same name, caught by the unique username index
+        raise HTTPException(status_code=400, detail="Username already exists")
     return {"msg": "User created successfully"}
 
 @router.post("/login", response_model=Token)
 async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
-    user = individual_serialize(users_collection.find_one({"username": form_data.username}))
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    user_doc = await with_retry(lambda: users_collection.find_one({"username": form_data.username}))
+    user = individual_serialize(user_doc) if user_doc else None
+    if not user or not await verify_password_async(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if needs_rehash(user["hashed_password"]):
+        # BCRYPT_ROUNDS changed since this password was stored: upgrade it while we have the plain text
+        try:
+            new_hash = await hash_password_async(form_data.password)
+            await users_collection.update_one(
+                {"_id": user_doc["_id"], "hashed_password": user["hashed_password"]},
+                {"$set": {"hashed_password": new_hash}},
+            )
+            invalidate_user(user["id"])
+        except Exception:
+            # the login itself already succeeded, try again next time
+            logger.exception("Could not rehash password for %s", user["username"])
     token = create_access_token(user["username"], user["id"], timedelta(minutes=60))
     return {"access_token": token, "token_type": "bearer"}
 
@@ -65,7 +99,7 @@ def create_access_token(username: str, user_id: str, expires_delta: timedelta):
     encode.update({"exp": expires})
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -76,21 +110,32 @@ def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        user = individual_serialize(users_collection.find_one({"username": username}))
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        user.pop("hashed_password", None)
-        return user
+        user = user_cache.get(user_id)
+        if user is None or user["username"] != username:
+            user_doc = await with_retry(lambda: users_collection.find_one({"username": username}))
+            if user_doc is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Could not validate credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            user = individual_serialize(user_doc)
+            user.pop("hashed_password", None)
+            user_cache.set(user_id, user)
+        # handlers get their own copy, the cached record is shared
+        return dict(user)
     except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+async def get_optional_user(token: Annotated[Optional[str], Depends(oauth2_optional)]):
+    if token is None:
+        return None
+    return await get_current_user(token)
+
 @router.get("/profile", response_model=UserPublic)
 async def read_users_me(current_user: Annotated[UserPublic, Depends(get_current_user)]):
     return current_user
\ No newline at end of file
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, HTTPException, Response, status, Depends
+from typing import Annotated
+from model.user import UserPublic
+from routers.auth import get_current_user
+from routers.simulate import bad_request
+from config import settings
+import utils.translation as translate
+from services.jobs import job_queue, ANALYSES, MEDIA_TYPES
+import services.transient_plan as transient_plan
+from utils.waveform import DTYPES
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+STATUS_FIELDS = ("analysis", "priority", "status", "created_at", "started_at", "finished_at", "expires_at", "error")
+
+
+async def owned_job(job_id, current_user):
+    job = await job_queue.store.get(job_id)
+    if job is None or job["user_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(frontend_data: dict, current_user: Annotated[UserPublic, Depends(get_current_user)]):
+    # body: the frontend circuit plus "analysis": "transient" (default) | "dc", "priority" (0-JOB_MAX_PRIORITY,
+    # higher runs first) and for transient step_time, end_time, "format" ("binary" | "png"), "dtype", "max_points",
+    # "reltol", "method"
+    try:
+        analysis = frontend_data.get("analysis", "transient")
+        if analysis not in ANALYSES:
+            raise ValueError(f"Unsupported analysis: {analysis}")
+        priority = int(frontend_data.get("priority", 0))
+        if not 0 <= priority <= settings.JOB_MAX_PRIORITY:
+            raise ValueError(f"priority must be between 0 and {settings.JOB_MAX_PRIORITY}")
+        if frontend_data.get("format", "binary") not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported format: {frontend_data.get('format')}")
+        if frontend_data.get("dtype", "float32") not in DTYPES:
+            raise ValueError(f"Unsupported dtype: {frontend_data.get('dtype')}")
+        max_points = frontend_data.get("max_points")
+        if max_points is not None and int(max_points) < 2:
+            raise ValueError("max_points must be at least 2")
+        # reject circuits that cannot translate (or transient settings that cannot be planned)
+        # now instead of failing the job later
+        translation_res = translate.convert_frontend_to_netlist(frontend_data)
+        if analysis == "transient":
+            transient_plan.plan_transient(translation_res["components"], frontend_data.get("step_time", 50e-6),
+                                          frontend_data.get("end_time", 30e-3), frontend_data.get("reltol"),
+                                          frontend_data.get("method"))
+    except (KeyError, TypeError, ValueError) as ve:
+        raise bad_request(ve)
+
+    if await job_queue.store.count_active(current_user["id"]) >= settings.JOB_USER_MAX_PENDING:
+        raise HTTPException(status_code=429, detail=f"At most {settings.JOB_USER_MAX_PENDING} queued or running jobs per user")
+
+    job = await job_queue.submit(current_user["id"], analysis, frontend_data, priority)
+    return {"job_id": job["_id"], "status": job["status"]}
+
+
+@router.get("/{job_id}", status_code=status.HTTP_200_OK)
+async def job_status(job_id: str, current_user: Annotated[UserPublic, Depends(get_current_user)]):
+    job = await owned_job(job_id, current_user)
+    response = {"job_id": job_id, **{field: job.get(field) for field in STATUS_FIELDS}}
+    if job["status"] == "queued":
+        response["queue_position"] = await job_queue.store.queue_position(job)
+    return response
+
+
+@router.get("/{job_id}/result", status_code=status.HTTP_200_OK)
+async def job_result(job_id: str, current_user: Annotated[UserPublic, Depends(get_current_user)]):
+    job = await owned_job(job_id, current_user)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    headers = {}
+    if job["analysis"] == "transient":
+        headers = {
+            "X-Original-Points": str(job["metadata"]["original_points"]),
+            "X-Decimated-Points": str(job["metadata"]["num_points"]),
+            **transient_plan.plan_headers(job["metadata"].get("plan")),
+        }
+    return Response(content=bytes(job["result"]), media_type=job["media_type"], headers=headers)
+
+
+@router.delete("/{job_id}", status_code=status.HTTP_200_OK)
+async def cancel_job(job_id: str, current_user: Annotated[UserPublic, Depends(get_current_user)]):
+    job = await owned_job(job_id, current_user)
+    if not await job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+    return {"job_id": job_id, "status": "cancelled"}
@@ -1,19 +1,121 @@
+import asyncio
+import base64
 import datetime
+import uuid
 from model.circuit import SimComponent, SimulationRequest, CircuitCreate
-from fastapi import APIRouter, HTTPException, Response, status, Depends
+from fastapi import APIRouter, HTTPException, Request, Response, status, Depends
+from fastapi.responses import StreamingResponse
 import services.simulation as sim
+import services.streaming as streaming
+import services.montecarlo as montecarlo
+import services.circuit_store as circuit_store
+import services.result_store as result_store
+import services.dc_session as dc_session
+import services.batch as batch_runner
+import services.transient_plan as transient_plan
 import utils.translation as translate
-from typing import Annotated
+from typing import Annotated, Optional
 from model.user import UserPublic
-from routers.auth import get_current_user
+from routers.auth import get_current_user, get_optional_user
 from bson import ObjectId
-from config.db import simulations_collection, users_collection
+from pymongo import DESCENDING
+from config.db import simulations_collection, users_collection, with_retry
+from config import settings
+from utils.cache import LRUTTLCache
+import utils.metrics as metrics
+from utils.fingerprint import circuit_fingerprint
+from utils.pagination import encode_cursor, after_cursor
+from services.executor import simulation_executor, QueueFullError, JobTimeoutError, WorkerCrashedError
+from utils.preflight import InvalidCircuit
 
 router = APIRouter(
     prefix="/simulate",
     tags=["simulate"],
 )
 
+# Keyed by circuit_fingerprint(): layout-only edits (moving/rotating parts) hit the cache.
+translation_cache = LRUTTLCache("translation", settings.TRANSLATION_CACHE_SIZE, settings.CACHE_TTL_SECONDS)
+TRANSIENT_MEDIA_TYPES = {
+    "binary": "application/octet-stream",
+    "png": "image/png",
+}
+
+result_cache = LRUTTLCache("simulation_results", settings.RESULT_CACHE_SIZE, settings.CACHE_TTL_SECONDS)
+
+LIST_PROJECTION = {"name": 1, "description": 1, "created_at": 1}
+# encoded circuit fields (services/circuit_store.py), replaced by components/wires in /load
+STORAGE_FIELDS = ("encoding", "circuit", "deltas", "results", "fingerprint")
+
+
+def bad_request(e):
+    # 400 for a ValueError; preflight rejections keep their diagnostics (InvalidCircuit handler in main.py)
+    if isinstance(e, InvalidCircuit):
+        return e
+    return HTTPException(status_code=400, detail=str(e))
+
+
+def translate_cached(frontend_data, fingerprint):
+    translation_res = translation_cache.get(fingerprint)
+    if translation_res is None:
+        translation_res = translate.convert_frontend_to_netlist(frontend_data)
+        translation_cache.set(fingerprint, translation_res)
+    return translation_res
+
+
+async def run_simulation(request: Request, fn, *args):
+    # Runs fn(*args) on the simulation worker pool; cancels the job if the client goes away.
+    job = asyncio.ensure_future(simulation_executor.run(fn, *args))
+    try:
+        while True:
+            done, _ = await asyncio.wait({job}, timeout=settings.DISCONNECT_POLL_SECONDS)
+            if done:
+                return job.result()
+            if await request.is_disconnected():
+                job.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except asyncio.CancelledError:
+        job.cancel()
+        raise
+    except (QueueFullError, WorkerCrashedError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except JobTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+async def stored_result(fingerprint, analysis, parameters, simulate):
+    # in-memory cache, then the persisted result store, and only then simulate()
+    key = result_store.result_key(fingerprint, analysis, parameters)
+    result = result_cache.get(key)
+    if result is None:
+        result = await result_store.fetch(key)
+        if result is None:
+            result = await simulate()
+            await result_store.put(key, fingerprint, analysis, parameters, result)
+        result_cache.set(key, result)
+    return key, result
+
+
+async def link_result(frontend_data, current_user, analysis, key):
+    # optional "circuit_id" / "revision" in the body: remember this run as the saved
+    # circuit's result, returned by /simulate/load?results=true
+    circuit_id = frontend_data.get("circuit_id")
+    if not circuit_id:
+        return
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="Sign in to attach results to a saved circuit")
+    try:
+        circuit_obj_id = ObjectId(circuit_id)
+        revision = int(frontend_data.get("revision", 1))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid circuit ID or revision")
+    if frontend_data.get("subcircuits"):
+        return  # saved circuits have no subcircuits, this cannot be a saved revision
+    try:
+        fingerprint = circuit_store.saved_fingerprint(frontend_data["components"], frontend_data["wires"])
+    except (KeyError, TypeError, ValueError):
+        return
+    await result_store.link(circuit_obj_id, ObjectId(current_user["id"]), revision, fingerprint, analysis, key)
+
 
 # @router.post("/DC", status_code=status.HTTP_200_OK)
 # async def simulate_circuit(sim_request: SimulationRequest):
@@ -41,55 +143,485 @@ router = APIRouter(
 #         raise HTTPException(status_code=400, detail="Unsupported simulation mode")
 
 @router.post("/transcient", status_code=status.HTTP_200_OK)
-async def transient(frontend_data: dict):
+async def transient(frontend_data: dict, request: Request,
+                    current_user: Annotated[Optional[dict], Depends(get_optional_user)],
+                    format: str = "binary", dtype: str = "float32", max_points: Optional[int] = None):
+    # format=binary (default): FEMW waveform buffer, see utils/waveform.py
+    # format=png: matplotlib plot of every node
+    # max_points: optional limit on the returned time points (shared by all nodes), applied with min/max decimation
+    if format not in TRANSIENT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if max_points is not None and max_points < 2:
+        raise HTTPException(status_code=400, detail="max_points must be at least 2")
     try:
-        translation_res = translate.convert_frontend_to_netlist(frontend_data)
-        result = sim.build_and_simulate_transient(
+        step_time = frontend_data.get("step_time", 50e-6)
+        end_time = frontend_data.get("end_time", 30e-3)
+        # optional ngspice tolerance / integration method, defaults TRANSIENT_RELTOL / TRANSIENT_METHOD
+        reltol = frontend_data.get("reltol")
+        method = frontend_data.get("method")
+        fingerprint = circuit_fingerprint(frontend_data)
+        parameters = {"step_time": step_time, "end_time": end_time, "format": format, "dtype": dtype, "max_points": max_points,
+                      "reltol": reltol, "method": method}
+
+        async def simulate():
+            translation_res = translate_cached(frontend_data, fingerprint)
+            return await run_simulation(
+                request,
+                sim.build_and_simulate_transient,
+                translation_res["components"],
+                step_time,
+                end_time,
+                format,
+                dtype,
+                max_points,
+                reltol,
+                method
+            )
+
+        key, (content, points) = await stored_result(fingerprint, "transient", parameters, simulate)
+        await link_result(frontend_data, current_user, "transient", key)
+        return Response(
+            content=content,
+            media_type=TRANSIENT_MEDIA_TYPES[format],
+            headers={
+                "X-Original-Points": str(points["original_points"]),
+                "X-Decimated-Points": str(points["num_points"]),
+                **transient_plan.plan_headers(points.get("plan")),
+            },
+        )
+    except ValueError as ve:
+        raise bad_request(ve)
+
+@router.post("/transcient/stream", status_code=status.HTTP_200_OK)
+async def transient_stream(frontend_data: dict):
+    # Chunked NDJSON: blocks of time/voltage samples are sent while ngspice is still running
+    try:
+        fingerprint = circuit_fingerprint(frontend_data)
+        translation_res = translate_cached(frontend_data, fingerprint)
+        deck, plan = streaming.build_transient_deck(
             translation_res["components"],
             frontend_data.get("step_time", 50e-6),
-            frontend_data.get("end_time", 30e-3)
+            frontend_data.get("end_time", 30e-3),
+            frontend_data.get("reltol"),
+            frontend_data.get("method")
         )
-        return Response(content=result, media_type="image/png")
     except ValueError as ve:
-        raise HTTPException(status_code=400, detail=str(ve))
+        raise bad_request(ve)
+    return StreamingResponse(streaming.stream_transient(deck, plan), media_type="application/x-ndjson",
+                             headers=transient_plan.plan_headers(plan))
 
 @router.post("/test", status_code=status.HTTP_200_OK)
-async def test_endpoint(frontend_data: dict):
+async def test_endpoint(frontend_data: dict, request: Request,
+                        current_user: Annotated[Optional[dict], Depends(get_optional_user)]):
     try:
-        translation_res = translate.convert_frontend_to_netlist(frontend_data)
-        result = sim.build_and_simulate_DC(translation_res["components"])
-        return {"result": result, 
-                "mappings": translation_res['mappings'], 
-                'components_mapping': translation_res['components_mapping']}
+        fingerprint = circuit_fingerprint(frontend_data)
+
+        async def simulate():
+            translation_res = translate_cached(frontend_data, fingerprint)
+            result = await run_simulation(request, sim.build_and_simulate_DC, translation_res["components"])
+            return {"result": result,
+                    "mappings": translation_res['mappings'],
+                    'components_mapping': translation_res['components_mapping']}
+
+        key, response = await stored_result(fingerprint, "dc", {}, simulate)
+        await link_result(frontend_data, current_user, "dc", key)
+        return response
     
     except ValueError as ve:
-        raise HTTPException(status_code=400, detail=str(ve))
+        raise bad_request(ve)
     
+@router.post("/sweep", status_code=status.HTTP_200_OK)
+async def sweep_endpoint(frontend_data: dict, request: Request):
+    # body: the frontend circuit plus
+    #   "sweep": {"component": <frontend id>, "values": [...]}
+    #   or       {"component": <frontend id>, "start": a, "stop": b, "points": n, "scale": "linear" | "log"}
+    try:
+        spec = frontend_data.get("sweep") or {}
+        values = sim.sweep_values(spec)
+        fingerprint = circuit_fingerprint(frontend_data)
+
+        # the response is cached whole: element and net names of the result only match
+        # the mappings of the translation they were simulated from
+        cache_key = (fingerprint, "sweep", spec.get("component"), tuple(values.tolist()))
+        response = result_cache.get(cache_key)
+        if response is None:
+            translation_res = translate_cached(frontend_data, fingerprint)
+            name = translation_res["components_mapping"].get(spec.get("component"))
+            if name is None:
+                raise ValueError(f"Unknown sweep component: {spec.get('component')}")
+            result = await run_simulation(request, sim.build_and_simulate_sweep,
+                                          translation_res["components"], name, values)
+            response = {"result": {"component": spec.get("component"), "name": name, **result},
+                        "mappings": translation_res['mappings'],
+                        'components_mapping': translation_res['components_mapping']}
+            result_cache.set(cache_key, response)
+        return response
+
+    except ValueError as ve:
+        raise bad_request(ve)
+
+@router.post("/ac", status_code=status.HTTP_200_OK)
+async def ac_endpoint(frontend_data: dict, request: Request, output: str = "complex", dtype: str = "float32"):
+    # body: the frontend circuit (sources carry "acMagnitude" / "acPhase") plus optional
+    #   "variation": "dec" | "oct" | "lin", "points" (per decade/octave, or total for lin),
+    #   "start_frequency" / "stop_frequency" in Hz
+    # returns a FEMW buffer on the frequency axis, see build_and_simulate_ac for output/dtype
+    try:
+        variation = frontend_data.get("variation", "dec")
+        points = int(frontend_data.get("points", 100))
+        start_frequency = float(frontend_data.get("start_frequency", 1.0))
+        stop_frequency = float(frontend_data.get("stop_frequency", 1e6))
+        fingerprint = circuit_fingerprint(frontend_data)
+        cache_key = (fingerprint, "ac", variation, points, start_frequency, stop_frequency, output, dtype)
+        content = result_cache.get(cache_key)
+        if content is None:
+            translation_res = translate_cached(frontend_data, fingerprint)
+            content = await run_simulation(
+                request,
+                sim.build_and_simulate_ac,
+                translation_res["components"],
+                variation,
+                points,
+                start_frequency,
+                stop_frequency,
+                output,
+                dtype
+            )
+            result_cache.set(cache_key, content)
+        return Response(content=content, media_type="application/octet-stream")
+    except (TypeError, ValueError) as ve:
+        raise bad_request(ve)
+
+@router.post("/montecarlo", status_code=status.HTTP_200_OK)
+async def monte_carlo_endpoint(frontend_data: dict):
+    # body: the frontend circuit plus
+    #   "montecarlo": {"analysis": "dc" | "transient", "samples": n, "seed": optional int,
+    #                  "distributions": {<frontend id>: {"dist": "normal" | "uniform", "tolerance": 0.05, "sigma": ...}},
+    #                  "types": {"R": {...}}   (for every component of that type without its own entry),
+    #                  "percentiles": [5, 50, 95]}
+    # Streams NDJSON progress lines followed by one line of per-node statistics.
+    try:
+        spec = frontend_data.get("montecarlo") or {}
+        fingerprint = circuit_fingerprint(frontend_data)
+        translation_res = translate_cached(frontend_data, fingerprint)
+        components = translation_res["components"]
+
+        by_type = spec.get("types") or {}
+        for kind in by_type:
+            if kind not in montecarlo.VARIABLE_TYPES:
+                raise ValueError(f"Cannot vary components of type: {kind}")
+        specs = {comp.name: by_type[comp.type] for comp in components if comp.type in by_type}
+        for comp_id, dist in (spec.get("distributions") or {}).items():
+            name = translation_res["components_mapping"].get(comp_id)
+            if name is None:
+                raise ValueError(f"Unknown component: {comp_id}")
+            specs[name] = dist
+        distributions = montecarlo.parse_distributions(components, specs)
+
+        percentiles = [float(p) for p in spec.get("percentiles", montecarlo.DEFAULT_PERCENTILES)]
+        if not percentiles or any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError("percentiles must be between 0 and 100")
+
+        analysis = spec.get("analysis", "dc")
+        n_samples = int(spec.get("samples", 1000))
+        if analysis == "dc":
+            job, max_samples, chunk_size, extra = montecarlo.dc_chunk, settings.MC_MAX_SAMPLES, settings.MC_CHUNK_SIZE, ()
+        elif analysis == "transient":
+            job, max_samples, chunk_size = montecarlo.transient_chunk, settings.MC_MAX_TRANSIENT_SAMPLES, settings.MC_TRANSIENT_CHUNK_SIZE
+            extra = (frontend_data.get("step_time", 50e-6), frontend_data.get("end_time", 30e-3), settings.MC_TRANSIENT_POINTS)
+        else:
+            raise ValueError(f"Unsupported analysis: {analysis}")
+        if not 1 <= n_samples <= max_samples:
+            raise ValueError(f"samples must be between 1 and {max_samples}")
+
+        seed = montecarlo.resolve_seed(spec.get("seed"))
+    except (TypeError, ValueError) as ve:
+        raise bad_request(ve)
+
+    return StreamingResponse(
+        montecarlo.stream_monte_carlo(job, components, distributions, n_samples, seed, chunk_size, percentiles, extra),
+        media_type="application/x-ndjson",
+    )
+
+BATCH_ANALYSES = {"dc", "transient"}
+
+
+def saved_circuit_frontend(simulation_doc):
+    # stored circuits keep the wire start as "from_" (CircuitCreate), simulations read "from"
+    components, wires = circuit_store.load_stored(simulation_doc)
+    return {
+        "components": components,
+        "wires": [{**{k: v for k, v in wire.items() if k != "from_"}, "from": wire["from_"]} for wire in wires],
+    }
+
+
+def batch_job(frontend_data, analysis, options):
+    # -> (result key, coroutine function returning the item's JSON result)
+    fingerprint = circuit_fingerprint(frontend_data)
+    if analysis == "dc":
+        parameters = {}
+
+        async def simulate():
+            translation_res = translate_cached(frontend_data, fingerprint)
+            result = await simulation_executor.run(sim.build_and_simulate_DC, translation_res["components"])
+            return {"result": result,
+                    "mappings": translation_res['mappings'],
+                    'components_mapping': translation_res['components_mapping']}
+    else:
+        # same parameters as /simulate/transcient with format=binary, so both share stored results
+        max_points = options.get("max_points")
+        if max_points is not None and int(max_points) < 2:
+            raise ValueError("max_points must be at least 2")
+        parameters = {
+            "step_time": options.get("step_time", 50e-6),
+            "end_time": options.get("end_time", 30e-3),
+            "format": "binary",
+            "dtype": options.get("dtype", "float32"),
+            "max_points": None if max_points is None else int(max_points),
+            "reltol": options.get("reltol"),
+            "method": options.get("method"),
+        }
+
+        async def simulate():
+            translation_res = translate_cached(frontend_data, fingerprint)
+            return await simulation_executor.run(
+                sim.build_and_simulate_transient, translation_res["components"], parameters["step_time"],
+                parameters["end_time"], parameters["format"], parameters["dtype"], parameters["max_points"],
+                parameters["reltol"], parameters["method"],
+            )
+
+    async def run():
+        _, result = await stored_result(fingerprint, analysis, parameters, simulate)
+        if analysis == "dc":
+            return result
+        content, points = result
+        return {"media_type": TRANSIENT_MEDIA_TYPES["binary"], "encoding": "base64",
+                "data": base64.b64encode(content).decode("ascii"), **points}
+
+    return result_store.result_key(fingerprint, analysis, parameters), run
+
+
+@router.post("/batch", status_code=status.HTTP_200_OK)
+async def batch_endpoint(batch: dict, current_user: Annotated[Optional[dict], Depends(get_optional_user)]):
+    # body: {"items": [{"id": optional client id, "circuit": <frontend circuit>} or {"circuit_id": <saved id>},
+    #        plus "analysis": "dc" (default) | "transient" and for transient optional
+    #        "step_time", "end_time", "max_points", "dtype"]}
+    # Saved circuits need the owner's bearer token. Streams NDJSON, see services/batch.py.
+    items = batch.get("items")
+    if not isinstance(items, list) or not 1 <= len(items) <= settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"items must be a list of 1 to {settings.BATCH_MAX_ITEMS} circuits")
+
+    # ids of any other type are reported on their item below
+    saved_ids = {item["circuit_id"] for item in items if isinstance(item, dict) and isinstance(item.get("circuit_id"), str)}
+    saved = {}
+    if saved_ids:
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Sign in to simulate saved circuits")
+        object_ids = [ObjectId(circuit_id) for circuit_id in saved_ids if ObjectId.is_valid(circuit_id)]
+        docs = await with_retry(lambda: simulations_collection.find(
+            {"_id": {"$in": object_ids}, "user_id": ObjectId(current_user["id"])},
+            {"user_id": 0, "results": 0},
+        ).to_list(None))
+        saved = {str(doc["_id"]): doc for doc in docs}
+
+    prepared = []
+    for index, item in enumerate(items):
+        entry = {"index": index, "id": item.get("id") if isinstance(item, dict) else None}
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Item must be an object")
+            analysis = item.get("analysis", "dc")
+            if analysis not in BATCH_ANALYSES:
+                raise ValueError(f"Unsupported analysis: {analysis}")
+            if item.get("circuit_id"):
+                if not isinstance(item["circuit_id"], str):
+                    raise ValueError("circuit_id must be a string")
+                doc = saved.get(item["circuit_id"])
+                if doc is None:
+                    raise ValueError("Circuit not found")
+                frontend_data = saved_circuit_frontend(doc)
+            elif isinstance(item.get("circuit"), dict):
+                frontend_data = item["circuit"]
+            else:
+                raise ValueError("Item needs a circuit or a circuit_id")
+            entry["key"], entry["run"] = batch_job(frontend_data, analysis, item)
+        except (KeyError, TypeError, ValueError) as e:
+            entry["error"] = str(e)
+        prepared.append(entry)
+
+    return StreamingResponse(batch_runner.stream_batch(prepared), media_type="application/x-ndjson")
+
+# Incremental DC: the session keeps the translated circuit (and the factorized MNA
+# system) between runs, see services/dc_session.py
+dc_sessions = LRUTTLCache("dc_sessions", settings.DC_SESSION_MAX, settings.DC_SESSION_TTL_SECONDS)
+
+
+async def session_response(request: Request, session_id, session, mode):
+    metrics.incr(f"dc_session.{mode}")
+    result = session.result
+    if result is None:
+        result = await run_simulation(request, sim.build_and_simulate_DC, session.components)
+    return {"session_id": session_id, "mode": mode, "result": result, **session.mappings}
+
+
+async def open_session(frontend_data):
+    fingerprint = circuit_fingerprint(frontend_data)
+    translation_res = translate_cached(frontend_data, fingerprint)
+    # the cached translation is shared, the session edits its own copy
+    components = [comp.model_copy() for comp in translation_res["components"]]
+    mappings = {"mappings": translation_res["mappings"], "components_mapping": translation_res["components_mapping"]}
+    return await asyncio.to_thread(dc_session.DCSession, components, mappings)
+
+
+@router.post("/session", status_code=status.HTTP_201_CREATED)
+async def create_session(frontend_data: dict, request: Request):
+    # body: the frontend circuit; returns the DC result plus a session_id for PATCH /session/{id}
+    try:
+        session = await open_session(frontend_data)
+        session_id = uuid.uuid4().hex
+        dc_sessions.set(session_id, session)
+        return await session_response(request, session_id, session, session.mode)
+    except ValueError as ve:
+        raise bad_request(ve)
+
+
+@router.patch("/session/{session_id}", status_code=status.HTTP_200_OK)
+async def patch_session(session_id: str, patch: dict, request: Request):
+    # body: {"changes": [{"component": <frontend id>, "value": v, "prefix": optional}]}
+    #   or the whole frontend circuit ("components" / "wires"): value edits are found by
+    #   diffing, any other change rebuilds the session (mode "rebuilt")
+    session = dc_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    try:
+        if "components" in patch:
+            fingerprint = circuit_fingerprint(patch)
+            translation_res = translate_cached(patch, fingerprint)
+            try:
+                changes = session.diff(translation_res["components"])
+            except dc_session.TopologyChanged:
+                session = await open_session(patch)
+                dc_sessions.set(session_id, session)
+                return await session_response(request, session_id, session, "rebuilt")
+        else:
+            names = session.mappings["components_mapping"]
+            changes = {}
+            for change in patch.get("changes") or []:
+                name = names.get(change.get("component"))
+                if name is None:
+                    raise ValueError(f"Unknown component: {change.get('component')}")
+                changes[name] = (float(change["value"]), change.get("prefix") or "")
+        mode = await asyncio.to_thread(session.apply, changes)
+        dc_sessions.set(session_id, session)  # refreshes the idle timeout
+        return await session_response(request, session_id, session, mode)
+    except (KeyError, TypeError, ValueError) as ve:
+        raise bad_request(ve)
+
+
+@router.delete("/session/{session_id}", status_code=status.HTTP_200_OK)
+async def close_session(session_id: str):
+    dc_sessions.invalidate(session_id)
+    return {"message": "Session closed", "session_id": session_id}
+
 @router.post("/save", status_code=status.HTTP_201_CREATED)
 async def save_circuit(circuit_data: CircuitCreate, current_user: Annotated[UserPublic, Depends(get_current_user)]):
-    simulation_doc = circuit_data.model_dump()
-    simulation_doc.update({
+    circuit = circuit_data.model_dump()
+    now = datetime.datetime.utcnow()
+    simulation_doc = {
+        "name": circuit["name"],
+        "description": circuit["description"],
         "user_id": ObjectId(current_user["id"]),
-        "created_at": datetime.datetime.utcnow()
-    })
+        "created_at": now,
+        "updated_at": now,
+    }
+    simulation_doc.update(circuit_store.snapshot_fields(circuit["components"], circuit["wires"]))
 
-    result = simulations_collection.insert_one(simulation_doc)
+    result = await simulations_collection.insert_one(simulation_doc)
     sim_id = result.inserted_id
 
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": ObjectId(current_user["id"])},
         {"$push": {"circuits": {"_id": sim_id, "name": circuit_data.name, "description": simulation_doc.get("description", "")}}}
     )
 
-    return {"message": "Circuit saved", "circuit_id": str(sim_id)}
+    return {"message": "Circuit saved", "circuit_id": str(sim_id), "revision": simulation_doc["revision"]}
+
+
+@router.put("/save/{circuit_id}", status_code=status.HTTP_200_OK)
+async def resave_circuit(circuit_id: str, circuit_data: CircuitCreate,
+                         current_user: Annotated[UserPublic, Depends(get_current_user)],
+                         revision: Optional[int] = None):
+    # Saves a new revision of an existing circuit, writing only what changed since the
+    # stored one. Pass the revision the edits are based on to get a 409 instead of
+    # overwriting a save made in between.
+    try:
+        circuit_obj_id = ObjectId(circuit_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid circuit ID")
 
-@router.get("/list", status_code=status.HTTP_200_OK)
-async def list_circuits(current_user: Annotated[UserPublic, Depends(get_current_user)]):
     user_id = ObjectId(current_user["id"])
-    simulations = simulations_collection.find({"user_id": user_id})
+    stored = await with_retry(lambda: simulations_collection.find_one(
+        {"_id": circuit_obj_id, "user_id": user_id}, {"user_id": 0}
+    ))
+    if not stored:
+        raise HTTPException(status_code=404, detail="Circuit not found")
+    # documents saved before revisions existed are revision 1
+    current_revision = stored.get("revision", 1)
+    if revision is not None and revision != current_revision:
+        raise HTTPException(status_code=409, detail=f"Circuit is at revision {current_revision}, not {revision}")
+
+    circuit = circuit_data.model_dump()
+    update, new_revision = circuit_store.plan_save(stored, circuit["components"], circuit["wires"])
+    details_changed = (circuit["name"], circuit["description"]) != (stored.get("name"), stored.get("description"))
+    if update is None and not details_changed:
+        return {"message": "Circuit unchanged", "circuit_id": circuit_id, "revision": current_revision}
+
+    update = update or {}
+    update.setdefault("$set", {}).update({
+        "name": circuit["name"],
+        "description": circuit["description"],
+        "updated_at": datetime.datetime.utcnow(),
+    })
+    # the revision in the filter makes the read-modify-write atomic against concurrent saves
+    result = await simulations_collection.update_one(
+        {"_id": circuit_obj_id, "user_id": user_id, "revision": stored.get("revision", {"$exists": False})},
+        update,
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=409, detail="Circuit was saved concurrently, reload it and try again")
+
+    if details_changed:
+        await users_collection.update_one(
+            {"_id": user_id, "circuits._id": circuit_obj_id},
+            {"$set": {"circuits.$.name": circuit["name"], "circuits.$.description": circuit["description"] or ""}}
+        )
+
+    return {"message": "Circuit saved", "circuit_id": circuit_id, "revision": new_revision}
+
+@router.get("/list", status_code=status.HTTP_200_OK)
+async def list_circuits(current_user: Annotated[UserPublic, Depends(get_current_user)],
+                        limit: int = settings.LIST_PAGE_SIZE, cursor: Optional[str] = None):
+    # Newest first; pass the returned next_cursor to get the following page (null on the last one)
+    if not 1 <= limit <= settings.LIST_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {settings.LIST_MAX_PAGE_SIZE}")
+    query = {"user_id": ObjectId(current_user["id"])}
+    if cursor:
+        try:
+            query.update(after_cursor(cursor))
+        except ValueError as ve:
+            raise HTTPException(status_code=400, detail=str(ve))
+
+    # only the listed fields leave the database; one extra document tells whether a next page exists
+    simulations = await with_retry(
+        lambda: simulations_collection.find(query, LIST_PROJECTION)
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    page = simulations[:limit]
 
     circuit_list = []
-    for sim_doc in simulations:
+    for sim_doc in page:
         circuit_list.append({
             "id": str(sim_doc["_id"]),
             "name": sim_doc["name"],
@@ -97,23 +629,48 @@ async def list_circuits(current_user: Annotated[UserPublic, Depends(get_current_
             "created_at": sim_doc["created_at"]
         })
 
-    return {"circuits": circuit_list}
+    next_cursor = None
+    if len(simulations) > limit:
+        next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["_id"])
+    return {"circuits": circuit_list, "next_cursor": next_cursor}
 
 
 @router.get("/load/{circuit_id}", status_code=status.HTTP_200_OK)
-async def load_circuit(circuit_id: str, current_user: Annotated[UserPublic, Depends(get_current_user)]):
-    simulation_doc = simulations_collection.find_one({"_id": ObjectId(circuit_id), "user_id": ObjectId(current_user["id"])})
+async def load_circuit(circuit_id: str, current_user: Annotated[UserPublic, Depends(get_current_user)],
+                       results: bool = False):
+    # results=true adds the stored results of the current revision under "results"
+    try:
+        circuit_obj_id = ObjectId(circuit_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid circuit ID")
+
+    simulation_doc = await with_retry(lambda: simulations_collection.find_one(
+        {"_id": circuit_obj_id, "user_id": ObjectId(current_user["id"])},
+        {"user_id": 0, "created_at": 0, "updated_at": 0},
+    ))
 
     if not simulation_doc:
         raise HTTPException(status_code=404, detail="Circuit not found")
 
+    components, wires = circuit_store.load_stored(simulation_doc)
+    if results:
+        stored_results = await result_store.linked_results(simulation_doc)
+    for field in STORAGE_FIELDS:
+        simulation_doc.pop(field, None)
+    simulation_doc["components"] = components
+    simulation_doc["wires"] = wires
+    simulation_doc.setdefault("revision", 1)
+    if results:
+        for entry in stored_results.values():
+            if "data" in entry:
+                entry["media_type"] = TRANSIENT_MEDIA_TYPES.get(entry["parameters"].get("format"), "application/octet-stream")
+                entry["data"] = base64.b64encode(entry["data"]).decode("ascii")
+        simulation_doc["results"] = stored_results
     simulation_doc["id"] = str(simulation_doc["_id"])
     del simulation_doc["_id"]
-    del simulation_doc["user_id"]
-    del simulation_doc["created_at"]
 
     return simulation_doc
-    
+
 
 
 @router.delete("/delete/{circuit_id}", status_code=status.HTTP_200_OK)
@@ -126,19 +683,21 @@ async def delete_circuit(
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid circuit ID")
 
-    circuit = simulations_collection.find_one({
+    # ownership check and delete in one round trip; not wrapped in with_retry: a retry after a
+    # lost acknowledgement would find nothing and answer 404, the driver's retryable writes
+    # already retry it safely
+    result = await simulations_collection.delete_one({
         "_id": circuit_obj_id,
         "user_id": ObjectId(current_user["id"])
     })
 
-    if not circuit:
+    if not result.deleted_count:
         raise HTTPException(status_code=404, detail="Circuit not found or not owned by user")
 
-    simulations_collection.delete_one({"_id": circuit_obj_id})
-
-    users_collection.update_one(
+    # $pull is idempotent, safe to repeat
+    await with_retry(lambda: users_collection.update_one(
         {"_id": ObjectId(current_user["id"])},
         {"$pull": {"circuits": {"_id": circuit_obj_id}}}
-    )
+    ))
 
     return {"message": "Circuit deleted successfully", "circuit_id": circuit_id}
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import logging
+
+from services.executor import simulation_executor, QueueFullError, JobTimeoutError, WorkerCrashedError
+
+# Streaming driver for /simulate/batch.
+#
+# Items arrive already prepared by the router: either an error (bad item, unknown
+# saved circuit, ...) or a result key plus a coroutine function computing the result.
+# Items with the same key (identical netlist and analysis settings) are simulated
+# once and every one of them gets the result. At most one job per worker is in
+# flight, so a large batch queues here instead of filling the shared executor queue,
+# and every item's line is written as soon as its result is known.
+
+logger = logging.getLogger(__name__)
+
+# expected per-item failures; anything else is logged and still only fails its own items
+ITEM_ERRORS = (QueueFullError, JobTimeoutError, WorkerCrashedError, KeyError, TypeError, ValueError)
+
+
+def _line(payload):
+    return json.dumps(payload, separators=(",", ":")) + "\n"
+
+
+def _item_line(item, **fields):
+    return _line({"type": "item", "index": item["index"], "id": item.get("id"), **fields})
+
+
+async def stream_batch(items):
+    # items: [{"index", "id", "error"}] or [{"index", "id", "key", "run"}]
+    # Async generator of NDJSON lines:
+    #   {"type": "item", "index": i, "id": ..., "status": "ok", "result": {...}}
+    #   {"type": "item", "index": i, "id": ..., "status": "error", "detail": "...", "diagnostics": [...] (preflight only)}
+    #   {"type": "end", "items": n, "unique": u, "errors": e}
+    groups = {}
+    errors = 0
+    for item in items:
+        if "error" in item:
+            errors += 1
+            yield _item_line(item, status="error", detail=item["error"])
+        else:
+            groups.setdefault(item["key"], []).append(item)
+
+    limit = asyncio.Semaphore(simulation_executor.max_workers)
+
+    async def run_group(key, group):
+        # -> (key, result, error fields)
+        async with limit:
+            try:
+                return key, await group[0]["run"](), None
+            except ITEM_ERRORS as e:
+                error = {"detail": str(e)}
+                if getattr(e, "diagnostics", None):
+                    # preflight rejection (utils/preflight.py)
+                    error["diagnostics"] = e.diagnostics
+                return key, None, error
+            except Exception as e:
+                logger.exception("Batch item failed")
+                return key, None, {"detail": f"Simulation failed: {e}"}
+
+    tasks = [asyncio.ensure_future(run_group(key, group)) for key, group in groups.items()]
+    try:
+        for next_group in asyncio.as_completed(tasks):
+            key, result, error = await next_group
+            for item in groups[key]:
+                if error is None:
+                    yield _item_line(item, status="ok", result=result)
+                else:
+                    errors += 1
+                    yield _item_line(item, status="error", **error)
+        yield _line({"type": "end", "items": len(items), "unique": len(groups), "errors": errors})
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,191 @@
+from PySpice.Spice.Netlist import Circuit
+
+# Single circuit-building pipeline shared by every analysis (DC, sweep, transient,
+# streaming, AC, Monte Carlo).
+#
+# Each SimComponent type has a builder in BUILDERS that returns its SPICE element
+# line. All lines are joined once and attached to a PySpice Circuit as raw SPICE, so
+# no per-component Unit objects or PySpice elements are created and a circuit with
+# thousands of parts costs a single string join. Supporting a new element type
+# (diode, switch, controlled source, ...) only takes a @register builder.
+#
+# Subcircuit instances (X) reference a SubcircuitDef; every definition used is emitted
+# once as a .subckt block ahead of the elements, so a stage instantiated hundreds of
+# times costs one line per instance.
+#
+# Element names keep the PySpice convention of putting the SPICE letter in front of
+# the component name (R1 -> RR1, PV1 -> VPV1), so ngspice vectors such as branch
+# currents keep the names they always had.
+
+prefix_map = {
+    "p": 1e-12,
+    "n": 1e-9,
+    "u": 1e-6,
+    "m": 1e-3,
+    "": 1,
+    "k": 1e3,
+    "M": 1e6,
+    "G": 1e9
+}
+
+# "none": gains and subcircuit instances
+UNITS = {"ohm", "volt", "farad", "henry", "ampere", "siemens", "none"}
+
+BUILDERS = {}
+LETTERS = {}
+
+
+def register(comp_type, letter=None):
+    # letter: SPICE element letter, defaults to the component type
+    def decorator(builder):
+        BUILDERS[comp_type] = builder
+        LETTERS[comp_type] = letter or comp_type
+        return builder
+    return decorator
+
+
+def element_name(comp):
+    # Name of the element (and of its "#branch" vector, lowercased) in ngspice
+    return LETTERS[comp.type] + comp.name
+
+
+def si_value(value, prefix):
+    prefix = prefix or ""
+    if prefix not in prefix_map:
+        raise ValueError(f"Unsupported prefix: {prefix}")
+    return value * prefix_map[prefix]
+
+
+def _number(value):
+    return f"{value:.12g}"
+
+
+def _element(comp, *params):
+    return " ".join((element_name(comp), comp.node1, comp.node2) + params)
+
+
+def _multi(comp, *params):
+    return " ".join((element_name(comp), *comp.terminals) + params)
+
+
+def _ac(comp):
+    if comp.ac_magnitude:
+        return ("AC", _number(comp.ac_magnitude), _number(comp.ac_phase or 0))
+    return ()
+
+
+@register("R")
+def resistor(comp):
+    return _element(comp, _number(si_value(comp.value, comp.prefix)))
+
+
+@register("C")
+def capacitor(comp):
+    return _element(comp, _number(si_value(comp.value, comp.prefix)))
+
+
+@register("L")
+def inductor(comp):
+    return _element(comp, _number(si_value(comp.value, comp.prefix)))
+
+
+@register("V")
+def voltage_source(comp):
+    return _element(comp, "DC", _number(si_value(comp.value, comp.prefix)), *_ac(comp))
+
+
+@register("I")
+def current_source(comp):
+    return _element(comp, "DC", _number(si_value(comp.value, comp.prefix)), *_ac(comp))
+
+
+@register("PV", "V")
+def pulse_voltage_source(comp):
+    # PULSE(V1 V2 TD TR TF PW PER), no delay and ideal edges
+    initial = si_value(comp.initial_value[0], comp.initial_value[1])
+    pulse = f"PULSE({_number(initial)} {_number(comp.pulse_value)} 0 0 0 {_number(comp.pulse_width)} {_number(comp.period)})"
+    return _element(comp, "DC", "0", pulse)
+
+
+@register("E")
+def voltage_controlled_voltage_source(comp):
+    # E out+ out- ctrl+ ctrl- gain
+    return _multi(comp, _number(si_value(comp.value, comp.prefix)))
+
+
+@register("G")
+def voltage_controlled_current_source(comp):
+    # G out+ out- ctrl+ ctrl- transconductance
+    return _multi(comp, _number(si_value(comp.value, comp.prefix)))
+
+
+@register("X")
+def subcircuit_instance(comp):
+    return _multi(comp, comp.subcircuit.name)
+
+
+def element_lines(components):
+    lines = []
+    for comp in components:
+        builder = BUILDERS.get(comp.type)
+        if builder is None:
+            raise ValueError(f"Unsupported component type: {comp.type}")
+        if comp.unit.lower() not in UNITS:
+            raise ValueError(f"Unsupported unit: {comp.unit}")
+        if any(node is None for node in comp.terminals):
+            raise ValueError(f"{comp.name} has an unconnected pin")
+        lines.append(builder(comp))
+    return lines
+
+
+def subcircuit_lines(components, emitted=None):
+    # .subckt blocks of the definitions used by components, nested ones first, each once
+    emitted = set() if emitted is None else emitted
+    lines = []
+    for comp in components:
+        definition = comp.subcircuit
+        if definition is None or definition.name in emitted:
+            continue
+        emitted.add(definition.name)
+        lines.extend(subcircuit_lines(definition.components, emitted))
+        lines.append(f".subckt {definition.name} {' '.join(definition.ports)}")
+        lines.extend(element_lines(definition.components))
+        lines.append(f".ends {definition.name}")
+    return lines
+
+
+def netlist_lines(components):
+    return subcircuit_lines(components) + element_lines(components)
+
+
+def flatten(components, scope="", ports=None):
+    # X instances expanded into plain elements, for engines that cannot read .subckt
+    # (native MNA). Internal names get the instance path as prefix the way ngspice
+    # names them (XX1.N2, XX1.XX2.R1), ground stays global. Ports are matched
+    # case-insensitively, like ngspice matches node names.
+    flat = []
+    for comp in components:
+        terminals = [node if node == "0" else (ports or {}).get(node.lower(), f"{scope}{node}") for node in comp.terminals]
+        if comp.subcircuit is not None:
+            inner = {port.lower(): node for port, node in zip(comp.subcircuit.ports, terminals)}
+            flat.extend(flatten(comp.subcircuit.components, f"{scope}{element_name(comp)}.", inner))
+        elif scope:
+            update = {"name": f"{scope}{comp.name}", "node1": terminals[0], "node2": terminals[1]}
+            if comp.nodes is not None:
+                update["nodes"] = terminals
+            flat.append(comp.model_copy(update=update))
+        else:
+            flat.append(comp)
+    return flat
+
+
+def build_circuit(components, title="Generated Circuit"):
+    circuit = Circuit(title)
+    circuit.raw_spice = "\n".join(netlist_lines(components)) + "\n"
+    return circuit
+
+
+def circuit_nodes(components):
+    # Non-ground node names in first-seen order
+    nodes = dict.fromkeys(node for comp in components for node in comp.terminals)
+    return [node for node in nodes if node != "0"]
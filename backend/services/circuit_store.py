@@ -0,0 +1,136 @@
+from bson import Binary
+
+from config import settings
+from model.circuit import ComponentJSON
+from utils.circuit_codec import VERSION, encode_circuit, decode_circuit
+from utils.fingerprint import circuit_fingerprint
+
+# Revisioned storage of saved circuits.
+#
+# A stored circuit document holds the encoded snapshot of some base revision in
+# "circuit" and, in "deltas", one entry per later save with only what that save
+# changed: the added/modified components and wires (encoded like a snapshot) and the
+# ids of the removed ones. Items are matched by id; a save that only moves a couple
+# of parts writes a few hundred bytes instead of the whole schematic. Once the deltas
+# pile up (count or size) the next save folds them into a new snapshot.
+#
+# Documents saved before this format have plain "components"/"wires" lists and are
+# read as they are; their first re-save converts them.
+#
+# Every save also stores the fingerprint of the saved circuit, results posted for the
+# circuit are only linked to it when they were computed for that same circuit.
+
+
+def saved_fingerprint(components, wires):
+    # circuit_fingerprint() of the circuit as a save keeps it: only the ComponentJSON fields,
+    # values as floats; wires may be stored ("from_") or posted ("from") ones
+    fields = ComponentJSON.model_fields.keys()
+    return circuit_fingerprint({
+        "components": [
+            {**{k: v for k, v in comp.items() if k in fields},
+             "value": None if comp.get("value") is None else float(comp["value"])}
+            for comp in components
+        ],
+        "wires": [{"from": wire["from_"] if "from_" in wire else wire["from"], "to": wire["to"]} for wire in wires],
+    })
+
+
+def snapshot_fields(components, wires, revision=1):
+    return {
+        "encoding": VERSION,
+        "revision": revision,
+        "circuit": Binary(encode_circuit(components, wires)),
+        "deltas": [],
+        "fingerprint": saved_fingerprint(components, wires),
+    }
+
+
+def _merge(items, changed, removed, order):
+    merged = {item["id"]: item for item in items if item["id"] not in removed}
+    merged.update((item["id"], item) for item in changed)
+    if order is not None:
+        return [merged[item_id] for item_id in order]
+    return list(merged.values())
+
+
+def apply_delta(components, wires, delta):
+    changed_components, changed_wires = decode_circuit(delta["circuit"])
+    components = _merge(components, changed_components, set(delta["removed_components"]), delta.get("component_order"))
+    wires = _merge(wires, changed_wires, set(delta["removed_wires"]), delta.get("wire_order"))
+    return components, wires
+
+
+def load_stored(doc):
+    # -> (components, wires) of the latest revision
+    if "circuit" not in doc:
+        return doc.get("components", []), doc.get("wires", [])
+    components, wires = decode_circuit(doc["circuit"])
+    for delta in doc.get("deltas", []):
+        components, wires = apply_delta(components, wires, delta)
+    return components, wires
+
+
+def _changes(old_items, new_items):
+    old = {item["id"]: item for item in old_items}
+    new_ids = {item["id"] for item in new_items}
+    changed = [item for item in new_items if old.get(item["id"]) != item]
+    removed = [item_id for item_id in old if item_id not in new_ids]
+
+    # merging keeps existing items in place and appends new ones; only store the
+    # order when the saved one differs from that
+    merged_order = [item_id for item_id in old if item_id in new_ids]
+    merged_order += [item["id"] for item in new_items if item["id"] not in old]
+    order = [item["id"] for item in new_items]
+    return changed, removed, None if order == merged_order else order
+
+
+def _unique_ids(items):
+    return len({item["id"] for item in items}) == len(items)
+
+
+def make_delta(old_components, old_wires, components, wires, revision):
+    # -> delta entry, or None when nothing changed. Ids must be unique on both sides
+    # (callers fall back to a snapshot otherwise).
+    changed_components, removed_components, component_order = _changes(old_components, components)
+    changed_wires, removed_wires, wire_order = _changes(old_wires, wires)
+    if not (changed_components or removed_components or component_order
+            or changed_wires or removed_wires or wire_order):
+        return None
+    delta = {
+        "revision": revision,
+        "circuit": Binary(encode_circuit(changed_components, changed_wires)),
+        "removed_components": removed_components,
+        "removed_wires": removed_wires,
+    }
+    if component_order is not None:
+        delta["component_order"] = component_order
+    if wire_order is not None:
+        delta["wire_order"] = wire_order
+    return delta
+
+
+def needs_snapshot(doc, delta):
+    deltas = doc.get("deltas", [])
+    if len(deltas) + 1 > settings.CIRCUIT_MAX_DELTAS:
+        return True
+    delta_bytes = sum(len(d["circuit"]) for d in deltas) + len(delta["circuit"])
+    return delta_bytes > len(doc["circuit"])
+
+
+def plan_save(doc, components, wires):
+    # -> (update, revision) for a re-save of doc; update is None when nothing changed
+    revision = doc.get("revision", 1) + 1
+    if "circuit" not in doc or not (_unique_ids(components) and _unique_ids(wires)):
+        return {"$set": snapshot_fields(components, wires, revision), "$unset": {"components": "", "wires": ""}}, revision
+
+    old_components, old_wires = load_stored(doc)
+    if not (_unique_ids(old_components) and _unique_ids(old_wires)):
+        return {"$set": snapshot_fields(components, wires, revision)}, revision
+    delta = make_delta(old_components, old_wires, components, wires, revision)
+    if delta is None:
+        return None, doc.get("revision", 1)
+    if needs_snapshot(doc, delta):
+        return {"$set": snapshot_fields(components, wires, revision)}, revision
+    # only the delta travels to the server
+    return {"$push": {"deltas": delta},
+            "$set": {"revision": revision, "fingerprint": saved_fingerprint(components, wires)}}, revision
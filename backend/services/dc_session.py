@@ -0,0 +1,182 @@
+import threading
+
+import numpy as np
+
+from config import settings
+import services.mna as mna
+from services.circuit_builder import prefix_map, si_value
+
+# Incremental DC re-simulation for an editing session (see /simulate/session).
+#
+# A session keeps the translated components and, for circuits the native MNA engine
+# handles, the sparse LU factorization of the system matrix A0. Value edits are then
+# solved without retranslating or refactorizing:
+# - V / I sources only change the right-hand side: one forward/back substitution;
+# - a resistor edit adds dg * u u^T to the matrix (u = e_node1 - e_node2), so all
+#   edits since the last factorization form A = A0 + U D U^T and the solution comes
+#   from the Woodbury identity with the cached columns Z = A0^-1 U:
+#       x = y - Z (D^-1 + U^T Z)^-1 U^T y,    y = A0^-1 b
+#   which costs one substitution plus a (changed resistors)^2 dense solve;
+# - once more than DC_SESSION_MAX_UPDATES resistors differ from A0 (or the small
+#   system is singular) the matrix is restamped and refactorized;
+# - L / C values do not enter the DC solution, the previous result stays valid.
+# Circuits outside the native engine keep only the components; edits update them and
+# the caller reruns ngspice. Topology changes raise TopologyChanged, the caller
+# starts a new session.
+
+SOURCE_TYPES = {"V", "I"}
+NO_DC_EFFECT = {"L", "C"}
+
+
+class TopologyChanged(Exception):
+    pass
+
+
+def _topology(components):
+    return [(comp.type, comp.name, *comp.terminals) for comp in components]
+
+
+class DCSession:
+
+    def __init__(self, components, mappings=None):
+        self.components = components
+        self.mappings = mappings or {}
+        self.index = {comp.name: i for i, comp in enumerate(components)}
+        self.lock = threading.Lock()
+        self.system = None
+        self.result = None
+        self.mode = "ngspice"
+        if settings.DC_ENGINE != "ngspice":
+            try:
+                self.system = mna.MNASystem(components, prefix_map)
+                self._factorize()
+                self.result = self._solve()
+                self.mode = "factorized"
+            except mna.UnsupportedCircuit as e:
+                if settings.DC_ENGINE == "native":
+                    raise ValueError(str(e))
+                self.system = None
+
+    @property
+    def native(self):
+        return self.system is not None
+
+    def _factorize(self):
+        self.lu = self.system.factorize()
+        self.base_values = self.system.values.copy()
+        self.columns = {}  # resistor index -> A0^-1 u
+
+    def _incidence(self, idx):
+        u = np.zeros(self.system.size)
+        a, b = self.system.n1[idx], self.system.n2[idx]
+        if a >= 0:
+            u[a] += 1.0
+        if b >= 0:
+            u[b] -= 1.0
+        return u
+
+    def _solve(self):
+        system = self.system
+        x = self.lu.solve(system._stamp_rhs())
+        changed = list(self.columns)
+        if changed:
+            Z = np.column_stack([self.columns[idx] for idx in changed])
+            U = np.column_stack([self._incidence(idx) for idx in changed])
+            dg = 1.0 / system.values[changed] - 1.0 / self.base_values[changed]
+            capacitance = np.diag(1.0 / dg) + U.T @ Z
+            x = x - Z @ np.linalg.solve(capacitance, U.T @ x)
+        if not np.all(np.isfinite(x)):
+            raise mna.UnsupportedCircuit("MNA solution is not finite")
+        return system.results(x)
+
+    def _refactorize(self):
+        self.system.matrix = self.system._stamp_matrix()
+        self._factorize()
+        return self._solve()
+
+    def apply(self, changes):
+        # changes: {element name: (value, prefix)}; returns the mode used, the new
+        # result is in self.result (None when ngspice has to rerun)
+        with self.lock:
+            # validate every change before touching the session
+            updates = []
+            for name, (value, prefix) in changes.items():
+                idx = self.index.get(name)
+                if idx is None:
+                    raise ValueError(f"Unknown component: {name}")
+                comp = self.components[idx]
+                if comp.type not in SOURCE_TYPES | NO_DC_EFFECT | {"R"}:
+                    raise ValueError(f"Cannot change the value of {name} incrementally")
+                si = si_value(value, prefix)
+                if comp.type == "R" and si <= 0:
+                    raise ValueError(f"{name} needs a positive resistance")
+                updates.append((idx, comp, value, prefix, si))
+
+            # apply, and put everything back when the edited circuit cannot be solved
+            saved = self._snapshot(updates)
+            try:
+                return self._apply(updates)
+            except (np.linalg.LinAlgError, mna.UnsupportedCircuit) as e:
+                self._restore(saved)
+                raise ValueError(str(e) or "The edited circuit is singular")
+
+    def _snapshot(self, updates):
+        values = [(comp, comp.value, comp.prefix) for _, comp, _, _, _ in updates]
+        state = {"result": self.result, "mode": self.mode}
+        if self.native:
+            state.update(values=self.system.values.copy(), matrix=self.system.matrix, lu=self.lu,
+                         base_values=self.base_values, columns=dict(self.columns))
+        return values, state
+
+    def _restore(self, saved):
+        values, state = saved
+        for comp, value, prefix in values:
+            comp.value, comp.prefix = value, prefix
+        self.result, self.mode = state["result"], state["mode"]
+        if self.native:
+            self.system.values[:] = state["values"]
+            self.system.matrix, self.lu = state["matrix"], state["lu"]
+            self.base_values, self.columns = state["base_values"], state["columns"]
+
+    def _apply(self, updates):
+        kinds = set()
+        for idx, comp, value, prefix, si in updates:
+            comp.value, comp.prefix = value, prefix or ""
+            kinds.add(comp.type)
+            if self.native:
+                self.system.values[idx] = si
+                if comp.type == "R":
+                    if si == self.base_values[idx]:
+                        self.columns.pop(idx, None)
+                    elif idx not in self.columns:
+                        self.columns[idx] = self.lu.solve(self._incidence(idx))
+
+        if not self.native:
+            self.result = None
+            self.mode = "ngspice"
+        elif not kinds - NO_DC_EFFECT:
+            self.mode = "unchanged"
+        elif len(self.columns) > settings.DC_SESSION_MAX_UPDATES:
+            self.result = self._refactorize()
+            self.mode = "refactorized"
+        else:
+            try:
+                self.result = self._solve()
+                self.mode = "low_rank" if "R" in kinds else "rhs"
+            except (np.linalg.LinAlgError, mna.UnsupportedCircuit):
+                # the update made the small system singular; a fresh factorization decides
+                self.result = self._refactorize()
+                self.mode = "refactorized"
+        return self.mode
+
+    def diff(self, components):
+        # {name: (value, prefix)} of the value edits turning this session into `components`
+        if _topology(components) != _topology(self.components):
+            raise TopologyChanged()
+        changes = {}
+        for old, new in zip(self.components, components):
+            if old.model_dump(exclude={"value", "prefix"}) != new.model_dump(exclude={"value", "prefix"}):
+                raise TopologyChanged()
+            if (old.value, old.prefix) != (new.value, new.prefix):
+                changes[new.name] = (new.value, new.prefix)
+        return changes
@@ -0,0 +1,184 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from config import settings
+import services.simulator_pool as simulator_pool
+import utils.metrics as metrics
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobTimeoutError(Exception):
+    pass
+
+
+class WorkerCrashedError(Exception):
+    pass
+
+
+class SimulationExecutor:
+    # Runs simulation jobs (ngspice + matplotlib) in a process pool so they never
+    # block the asyncio event loop.
+    #
+    # - max_workers: number of worker processes
+    # - max_queue: jobs allowed to wait for a free worker; beyond that run() raises QueueFullError
+    # - timeout: per-job wall clock limit in seconds. ngspice cannot be interrupted from
+    #   Python, so a job that overruns while running gets its pool retired: new jobs go
+    #   to a fresh pool, the other jobs of the old one finish (or hit their own limit),
+    #   then its workers are killed. Killing only the stuck worker is not an option, a
+    #   ProcessPoolExecutor that loses a worker fails every job it still holds.
+    # - recycle_after: worker processes (and their ngspice session) are replaced after
+    #   this many jobs, 0 keeps them forever
+    # Cancelling the awaiting task cancels the job if it has not started yet.
+
+    def __init__(self, max_workers: int, max_queue: int, timeout: float, recycle_after: int = 0):
+        self.max_workers = max_workers
+        self.recycle_after = recycle_after
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        # pool -> {future: deadline (time.monotonic())} of the jobs submitted to it
+        self._jobs = {}
+        self._in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=simulator_pool.init_worker,
+                    max_tasks_per_child=self.recycle_after or None,
+                )
+                self._jobs[self._pool] = {}
+            return self._pool
+
+    def _detach(self, pool):
+        # -> True when pool was the current one; later jobs then start a new pool
+        with self._lock:
+            if self._pool is not pool:
+                return False
+            self._pool = None
+        metrics.incr("executor.recycled")
+        return True
+
+    def _kill(self, pool):
+        # Kill the workers outright: a stuck ngspice run will never return on its own.
+        with self._lock:
+            self._jobs.pop(pool, None)
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle_pool(self, pool):
+        # the pool is broken (a worker died): every job on it has failed already
+        if self._detach(pool):
+            self._kill(pool)
+
+    def _retire_pool(self, pool):
+        # a job overran: let the pool's other jobs finish before killing its workers
+        if self._detach(pool):
+            threading.Thread(target=self._drain, args=(pool,), name="executor-drain", daemon=True).start()
+
+    def _drain(self, pool):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                pending = {future: deadline for future, deadline in self._jobs.get(pool, {}).items()
+                           if deadline > now and not future.done()}
+            if not pending:
+                break
+            wait(pending, timeout=max(pending.values()) - now)
+        self._kill(pool)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, fn, *args, timeout: float = None):
+        if self._in_flight >= self.capacity:
+            self.rejected += 1
+            raise QueueFullError("Simulation queue is full, please try again shortly.")
+
+        timeout = self.timeout if timeout is None else timeout
+        pool = self._get_pool()
+        self._in_flight += 1
+        future = None
+        try:
+            future = pool.submit(simulator_pool.run_job, fn, *args)
+            with self._lock:
+                jobs = self._jobs.get(pool)
+                if jobs is not None:
+                    jobs[future] = time.monotonic() + timeout
+            try:
+                result, timings = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                if not future.cancel():
+                    self._retire_pool(pool)
+                raise JobTimeoutError(f"Simulation exceeded the {timeout:g} s time limit.")
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                future.cancel()
+                raise
+            except BrokenProcessPool:
+                self.failed += 1
+                self._recycle_pool(pool)
+                raise WorkerCrashedError("Simulation worker stopped unexpectedly, please retry.")
+            except Exception:
+                self.failed += 1
+                raise
+            self.completed += 1
+            if "startup" in timings:
+                metrics.observe("simulator.startup", timings["startup"])
+            if timings.get("solve"):
+                metrics.observe("simulator.solve", timings["solve"])
+            return result
+        finally:
+            self._in_flight -= 1
+            with self._lock:
+                self._jobs.get(pool, {}).pop(future, None)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            retiring = [old for old in self._jobs if old is not pool]
+            self._jobs.pop(pool, None)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for old in retiring:
+            self._kill(old)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+        }
+
+
+simulation_executor = SimulationExecutor(
+    max_workers=settings.SIM_WORKERS or os.cpu_count() or 1,
+    max_queue=settings.SIM_QUEUE_DEPTH,
+    timeout=settings.SIM_TIMEOUT_SECONDS,
+    recycle_after=settings.SIM_RECYCLE_AFTER,
+)
+metrics.register_source("executor", simulation_executor.stats)
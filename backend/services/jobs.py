@@ -0,0 +1,307 @@
+import asyncio
+import datetime
+import json
+import logging
+import uuid
+
+from bson import Binary
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from config import settings
+from config.db import jobs_collection
+import services.simulation as sim
+import utils.metrics as metrics
+import utils.translation as translate
+from services.executor import simulation_executor, QueueFullError
+
+# Background simulation jobs (see routers/jobs.py).
+#
+# A job is submitted with its frontend circuit and analysis settings, runs later on
+# the simulation worker pool and keeps its result until it expires, so long transient
+# runs never hold an HTTP connection open. Jobs are plain documents in a JobStore:
+# - MemoryJobStore: a dict in this process (JOB_BACKEND=memory, the default);
+# - MongoJobStore: the "jobs" collection (JOB_BACKEND=mongo); several API processes
+#   can share it, claims are atomic and results survive a restart.
+# The JobQueue dispatcher of every process claims queued jobs, highest priority first
+# then oldest, skipping users that already run JOB_USER_CONCURRENCY jobs, and runs up
+# to JOB_CONCURRENCY of them at a time with the JOB_TIMEOUT_SECONDS time limit.
+# Finished jobs (done, failed, cancelled) are deleted JOB_RESULT_TTL_SECONDS later.
+# A job is one call on the worker pool, so there is no progress to report between
+# "running" and "done".
+
+logger = logging.getLogger(__name__)
+
+ANALYSES = {"transient", "dc"}
+ACTIVE = ("queued", "running")
+MEDIA_TYPES = {"binary": "application/octet-stream", "png": "image/png"}
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+def _order(job):
+    # dispatch order: highest priority first, then oldest
+    return -job["priority"], job["created_at"]
+
+
+class MemoryJobStore:
+
+    def __init__(self):
+        self.jobs = {}
+
+    async def insert(self, job):
+        self.jobs[job["_id"]] = dict(job)
+
+    async def get(self, job_id):
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def update(self, job_id, fields, expected=None):
+        # applies fields unless the job's status is not in `expected`; True when applied
+        job = self.jobs.get(job_id)
+        if job is None or (expected and job["status"] not in expected):
+            return False
+        job.update(fields)
+        return True
+
+    async def claim(self, exclude_users, now):
+        queued = [job for job in self.jobs.values() if job["status"] == "queued" and job["user_id"] not in exclude_users]
+        if not queued:
+            return None
+        job = min(queued, key=_order)
+        job.update({"status": "running", "started_at": now})
+        return dict(job)
+
+    async def running_by_user(self):
+        counts = {}
+        for job in self.jobs.values():
+            if job["status"] == "running":
+                counts[job["user_id"]] = counts.get(job["user_id"], 0) + 1
+        return counts
+
+    async def count_active(self, user_id):
+        return sum(1 for job in self.jobs.values() if job["user_id"] == user_id and job["status"] in ACTIVE)
+
+    async def queue_position(self, job):
+        return sum(1 for other in self.jobs.values() if other["status"] == "queued" and _order(other) < _order(job))
+
+    async def purge(self, now, stale_before):
+        for job_id, job in list(self.jobs.items()):
+            if job.get("expires_at") and job["expires_at"] <= now:
+                del self.jobs[job_id]
+            elif job["status"] == "running" and job["started_at"] < stale_before:
+                job.update(_interrupted(now))
+
+
+class MongoJobStore:
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert(self, job):
+        await self.collection.insert_one(job)
+
+    async def get(self, job_id):
+        return await self.collection.find_one({"_id": job_id})
+
+    async def update(self, job_id, fields, expected=None):
+        query = {"_id": job_id}
+        if expected:
+            query["status"] = {"$in": list(expected)}
+        result = await self.collection.update_one(query, {"$set": fields})
+        return bool(result.matched_count)
+
+    async def claim(self, exclude_users, now):
+        # atomic: two processes never claim the same job
+        return await self.collection.find_one_and_update(
+            {"status": "queued", "user_id": {"$nin": list(exclude_users)}},
+            {"$set": {"status": "running", "started_at": now}},
+            sort=[("priority", DESCENDING), ("created_at", ASCENDING)],
+            projection={"result": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def running_by_user(self):
+        cursor = self.collection.aggregate([
+            {"$match": {"status": "running"}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+        ])
+        return {row["_id"]: row["count"] async for row in cursor}
+
+    async def count_active(self, user_id):
+        return await self.collection.count_documents({"user_id": user_id, "status": {"$in": list(ACTIVE)}})
+
+    async def queue_position(self, job):
+        return await self.collection.count_documents({"status": "queued", "$or": [
+            {"priority": {"$gt": job["priority"]}},
+            {"priority": job["priority"], "created_at": {"$lt": job["created_at"]}},
+        ]})
+
+    async def purge(self, now, stale_before):
+        # expired documents are removed by the TTL index (config/db.py)
+        await self.collection.update_many(
+            {"status": "running", "started_at": {"$lt": stale_before}}, {"$set": _interrupted(now)}
+        )
+
+
+def _finished(status, now, **fields):
+    return {"status": status, "finished_at": now,
+            "expires_at": now + datetime.timedelta(seconds=settings.JOB_RESULT_TTL_SECONDS), **fields}
+
+
+def _interrupted(now):
+    # running longer than the time limit allows: the process running it went away
+    return _finished("failed", now, error="Job was interrupted, please submit it again.")
+
+
+async def run_job(job):
+    # -> (content bytes, media type, metadata)
+    payload = job["payload"]
+    # large circuits take a while to translate: keep it off the event loop
+    translation_res = await asyncio.to_thread(translate.convert_frontend_to_netlist, payload)
+    if job["analysis"] == "transient":
+        output_format = payload.get("format", "binary")
+        content, points = await simulation_executor.run(
+            sim.build_and_simulate_transient,
+            translation_res["components"],
+            payload.get("step_time", 50e-6),
+            payload.get("end_time", 30e-3),
+            output_format,
+            payload.get("dtype", "float32"),
+            payload.get("max_points"),
+            payload.get("reltol"),
+            payload.get("method"),
+            timeout=settings.JOB_TIMEOUT_SECONDS,
+        )
+        return content, MEDIA_TYPES[output_format], points
+
+    result = await simulation_executor.run(sim.build_and_simulate_DC, translation_res["components"],
+                                           timeout=settings.JOB_TIMEOUT_SECONDS)
+    content = json.dumps({"result": result, "mappings": translation_res["mappings"],
+                          "components_mapping": translation_res["components_mapping"]}, default=float)
+    return content.encode("utf-8"), "application/json", {}
+
+
+class JobQueue:
+
+    def __init__(self, store, concurrency, user_concurrency):
+        self.store = store
+        self.concurrency = concurrency
+        self.user_concurrency = user_concurrency
+        self.tasks = {}
+        self._runner = None
+        self._wake = None
+
+    async def submit(self, user_id, analysis, payload, priority):
+        now = _now()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "analysis": analysis,
+            "payload": payload,
+            "priority": priority,
+            "status": "queued",
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": None,
+            "error": None,
+        }
+        await self.store.insert(job)
+        metrics.incr("jobs.submitted")
+        self.wake()
+        return job
+
+    async def cancel(self, job_id):
+        cancelled = await self.store.update(job_id, _finished("cancelled", _now()), expected=ACTIVE)
+        task = self.tasks.get(job_id)
+        if cancelled and task is not None:
+            task.cancel()
+        if cancelled:
+            metrics.incr("jobs.cancelled")
+        return cancelled
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._runner = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        for task in [self._runner, *self.tasks.values()]:
+            if task is not None:
+                task.cancel()
+        self._runner = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self._dispatch()
+            except Exception:
+                logger.exception("Job dispatch failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _dispatch(self):
+        now = _now()
+        await self.store.purge(now, now - datetime.timedelta(seconds=2 * settings.JOB_TIMEOUT_SECONDS))
+        while len(self.tasks) < self.concurrency:
+            running = await self.store.running_by_user()
+            full = {user for user, count in running.items() if count >= self.user_concurrency}
+            job = await self.store.claim(full, _now())
+            if job is None:
+                return
+            metrics.observe("jobs.wait", (job["started_at"] - job["created_at"]).total_seconds())
+            self.tasks[job["_id"]] = asyncio.ensure_future(self._run(job))
+
+    async def _run(self, job):
+        job_id = job["_id"]
+        requeued = False
+        try:
+            content, media_type, metadata = await run_job(job)
+            if len(content) > settings.JOB_RESULT_MAX_BYTES:
+                raise ValueError(f"Result is larger than {settings.JOB_RESULT_MAX_BYTES} bytes, use max_points to reduce it")
+            done = _finished("done", _now(), result=Binary(content), media_type=media_type, metadata=metadata)
+            if await self.store.update(job_id, done, expected=("running",)):
+                metrics.incr("jobs.done")
+        except asyncio.CancelledError:
+            pass
+        except QueueFullError:
+            # interactive requests filled the worker pool: back in line, retried on the next round
+            requeued = await self.store.update(job_id, {"status": "queued", "started_at": None},
+                                               expected=("running",))
+        except Exception as e:
+            if not isinstance(e, ValueError):
+                logger.exception("Job %s failed", job_id)
+            await self.store.update(job_id, _finished("failed", _now(), error=str(e)), expected=("running",))
+            metrics.incr("jobs.failed")
+        finally:
+            self.tasks.pop(job_id, None)
+            if not requeued:
+                self.wake()
+
+    def stats(self) -> dict:
+        return {"running_here": len(self.tasks), "concurrency": self.concurrency,
+                "user_concurrency": self.user_concurrency, "backend": settings.JOB_BACKEND}
+
+
+def _make_store():
+    if settings.JOB_BACKEND == "mongo":
+        return MongoJobStore(jobs_collection)
+    if settings.JOB_BACKEND != "memory":
+        raise ValueError(f"Unsupported JOB_BACKEND: {settings.JOB_BACKEND}")
+    return MemoryJobStore()
+
+
+job_queue = JobQueue(
+    _make_store(),
+    concurrency=settings.JOB_CONCURRENCY or simulation_executor.max_workers,
+    user_concurrency=settings.JOB_USER_CONCURRENCY,
+)
+metrics.register_source("jobs", job_queue.stats)
@@ -0,0 +1,226 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+# In-process DC operating point for linear R/V/I/L/C circuits (modified nodal analysis).
+#
+# Unknowns are the non-ground node voltages followed by one branch current per
+# voltage source and inductor. Capacitors are open at DC and add nothing; inductors
+# are shorts, i.e. 0 V sources whose branch current is the inductor current.
+# Branch currents follow the SPICE convention (positive from node1 through the
+# element to node2), so results match what ngspice reports.
+#
+# Components are read once into flat index/value arrays and every stamp is done
+# with NumPy, so building the system stays cheap for circuits with 100k+ elements.
+
+NATIVE_TYPES = {"R", "V", "I", "L", "C"}
+
+
+class UnsupportedCircuit(Exception):
+    # Raised for anything the native engine does not handle; callers fall back to ngspice
+    pass
+
+
+class MNASystem:
+
+    def __init__(self, components, prefix_map):
+        node_index = {}
+        names, types, n1, n2, values = [], [], [], [], []
+
+        for comp in components:
+            if comp.type not in NATIVE_TYPES:
+                raise UnsupportedCircuit(f"Unsupported component type for native DC: {comp.type}")
+            if comp.node1 is None or comp.node2 is None:
+                raise UnsupportedCircuit(f"{comp.name} has an unconnected pin")
+            prefix = comp.prefix or ""
+            if prefix not in prefix_map:
+                raise UnsupportedCircuit(f"Unsupported prefix: {prefix}")
+            value = comp.value * prefix_map[prefix]
+            if comp.type == "R" and value <= 0:
+                raise UnsupportedCircuit(f"{comp.name} has a non-positive resistance")
+
+            names.append(comp.name)
+            types.append(comp.type)
+            values.append(value)
+            n1.append(-1 if comp.node1 == "0" else node_index.setdefault(comp.node1, len(node_index)))
+            n2.append(-1 if comp.node2 == "0" else node_index.setdefault(comp.node2, len(node_index)))
+
+        self.node_index = node_index
+        self.names = names
+        self.types = np.array(types)
+        self.n1 = np.array(n1, dtype=np.int64)
+        self.n2 = np.array(n2, dtype=np.int64)
+        self.values = np.array(values, dtype=np.float64)
+
+        n = len(node_index)
+        is_branch = (self.types == "V") | (self.types == "L")
+        self.branch = np.full(len(names), -1, dtype=np.int64)
+        self.branch[is_branch] = n + np.arange(np.count_nonzero(is_branch))
+        self.num_nodes = n
+        self.size = n + int(np.count_nonzero(is_branch))
+
+        self.matrix = self._stamp_matrix()
+        self.rhs = self._stamp_rhs()
+
+    def _stamp_entries(self, values):
+        # COO entries of the MNA matrix; values may be (elements,) or (elements, points)
+        r = self.types == "R"
+        a, b, g = self.n1[r], self.n2[r], 1.0 / values[r]
+
+        br = self.branch >= 0
+        ka, kb, k = self.n1[br], self.n2[br], self.branch[br]
+        ones = np.ones((k.shape[0],) + values.shape[1:])
+
+        rows = np.concatenate((a, b, a, b, ka, kb, k, k))
+        cols = np.concatenate((a, b, b, a, k, k, ka, kb))
+        vals = np.concatenate((g, g, -g, -g, ones, -ones, ones, -ones))
+
+        keep = (rows >= 0) & (cols >= 0)
+        return rows[keep], cols[keep], vals[keep]
+
+    def _stamp_matrix(self, values=None):
+        rows, cols, vals = self._stamp_entries(self.values if values is None else values)
+        return sp.csc_matrix((vals, (rows, cols)), shape=(self.size, self.size))
+
+    def _stamp_rhs(self, values=None):
+        values = self.values if values is None else values
+        rhs = np.zeros((self.size,) + values.shape[1:])
+
+        # SPICE current source: current enters node1, flows through the source, leaves at node2
+        i = self.types == "I"
+        a, b, current = self.n1[i], self.n2[i], values[i]
+        np.add.at(rhs, a[a >= 0], -current[a >= 0])
+        np.add.at(rhs, b[b >= 0], current[b >= 0])
+
+        v = self.types == "V"
+        rhs[self.branch[v]] = values[v]
+        return rhs
+
+    def factorize(self):
+        if self.size == 0:
+            raise UnsupportedCircuit("Circuit has no non-ground nodes")
+        try:
+            return spla.splu(self.matrix)
+        except RuntimeError as e:
+            # "Factor is exactly singular": floating node, V/L loop, I cutset, ...
+            raise UnsupportedCircuit(f"Singular MNA matrix: {e}")
+
+    def solve(self, lu=None, rhs=None):
+        lu = lu or self.factorize()
+        x = lu.solve(self.rhs if rhs is None else rhs)
+        if not np.all(np.isfinite(x)):
+            raise UnsupportedCircuit("MNA solution is not finite")
+        return x
+
+    def currents(self, x, values=None):
+        # x is one solution vector or a (size, points) block of them (one column per point);
+        # values optionally gives per-point element values with shape (elements, points)
+        x = x.reshape(self.size, -1)
+        pad = np.zeros((1, x.shape[1]))
+        # ground (index -1) reads the appended 0 V row
+        voltages = np.vstack((x[:self.num_nodes], pad))
+        branch_current = np.vstack((x, pad))[self.branch]
+        values = self.values[:, None] if values is None else values
+
+        currents = np.zeros((len(self.names), x.shape[1]))
+        r = self.types == "R"
+        currents[r] = (voltages[self.n1[r]] - voltages[self.n2[r]]) / values[r]
+        v = self.types == "V"
+        currents[v] = -branch_current[v]
+        l = self.types == "L"
+        currents[l] = branch_current[l]
+        i = self.types == "I"
+        currents[i] = values[i]
+        return currents
+
+    def solve_batch(self, values, dense_max_size=128):
+        # One solution column per column of `values` (elements, points).
+        # - only sources vary: single factorization, multi-RHS solve
+        # - small systems: stacked dense matrices, one batched np.linalg.solve
+        # - otherwise: sparse refactorization per point
+        points = values.shape[1]
+        rhs = self._stamp_rhs(values)
+        r = self.types == "R"
+        if np.array_equal(values[r], np.broadcast_to(self.values[r][:, None], values[r].shape)):
+            return self.solve(rhs=rhs).reshape(self.size, points)
+
+        if self.size <= dense_max_size:
+            rows, cols, vals = self._stamp_entries(values)
+            matrices = np.zeros((points, self.size, self.size))
+            np.add.at(matrices, (slice(None), rows, cols), vals.T)
+            try:
+                x = np.linalg.solve(matrices, rhs.T[..., None])[..., 0].T
+            except np.linalg.LinAlgError as e:
+                raise UnsupportedCircuit(f"Singular MNA matrix: {e}")
+            if not np.all(np.isfinite(x)):
+                raise UnsupportedCircuit("MNA solution is not finite")
+            return x
+
+        x = np.empty((self.size, points))
+        for col in range(points):
+            self.matrix = self._stamp_matrix(values[:, col])
+            x[:, col] = self.solve(rhs=rhs[:, col])
+        self.matrix = self._stamp_matrix()
+        return x
+
+    def results(self, x):
+        node_voltages = dict(zip((node.lower() for node in self.node_index), x[:self.num_nodes].tolist()))
+        component_currents = dict(zip(self.names, self.currents(x)[:, 0].tolist()))
+        return {"node_voltages": node_voltages, "component_currents": component_currents}
+
+    def sweep(self, name, values):
+        # Columnar DC sweep of one element's value.
+        # Source sweeps only move the right-hand side: one factorization, one multi-RHS solve.
+        # Resistor sweeps change the matrix and are refactorized per point.
+        if name not in self.names:
+            raise UnsupportedCircuit(f"Unknown component: {name}")
+        idx = self.names.index(name)
+        kind = self.types[idx]
+        values = np.asarray(values, dtype=np.float64)
+
+        if kind in ("V", "I"):
+            rhs = np.repeat(self.rhs[:, None], values.shape[0], axis=1)
+            if kind == "V":
+                rhs[self.branch[idx]] = values
+            else:
+                delta = values - self.values[idx]
+                if self.n1[idx] >= 0:
+                    rhs[self.n1[idx]] -= delta
+                if self.n2[idx] >= 0:
+                    rhs[self.n2[idx]] += delta
+            x = self.solve(rhs=rhs).reshape(self.size, -1)
+            currents = self.currents(x)
+            if kind == "I":
+                currents[idx] = values
+        elif kind == "R":
+            if np.any(values <= 0):
+                raise UnsupportedCircuit("Resistor sweep values must be positive")
+            nominal = self.values[idx]
+            x = np.empty((self.size, values.shape[0]))
+            currents = np.empty((len(self.names), values.shape[0]))
+            try:
+                for col, value in enumerate(values):
+                    self.values[idx] = value
+                    self.matrix = self._stamp_matrix()
+                    x[:, col] = self.solve()
+                    currents[:, col] = self.currents(x[:, col])[:, 0]
+            finally:
+                self.values[idx] = nominal
+                self.matrix = self._stamp_matrix()
+        else:
+            raise UnsupportedCircuit(f"Cannot sweep a {kind} element at DC")
+
+        return {
+            "values": values.tolist(),
+            "node_voltages": dict(zip((node.lower() for node in self.node_index), x[:self.num_nodes].tolist())),
+            "component_currents": dict(zip(self.names, currents.tolist())),
+        }
+
+
+def solve_dc(components, prefix_map):
+    system = MNASystem(components, prefix_map)
+    return system.results(system.solve())
+
+
+def sweep_dc(components, prefix_map, name, values):
+    return MNASystem(components, prefix_map).sweep(name, values)
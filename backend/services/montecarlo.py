@@ -0,0 +1,222 @@
+import asyncio
+import json
+
+import numpy as np
+
+from config import settings
+import services.mna as mna
+import services.simulation as sim
+from services.executor import simulation_executor, QueueFullError, JobTimeoutError, WorkerCrashedError
+
+# Monte Carlo / tolerance analysis.
+#
+# Every varied component gets a multiplicative factor per sample, drawn from its
+# distribution ("normal": 1 + sigma * N(0, 1), sigma defaults to tolerance / 3;
+# "uniform": 1 + U(-tolerance, tolerance)). Samples are split into fixed-size chunks
+# and each chunk is one job on the simulation worker pool. Chunk i always draws from
+# SeedSequence(seed).spawn(n)[i], so the result only depends on the seed, never on
+# how the chunks were scheduled.
+#
+# DC chunks are solved in one go with MNASystem.solve_batch(); transient chunks (and
+# circuits the native engine does not handle) run one ngspice analysis per sample.
+# Only aggregated statistics leave the API, never the raw samples.
+
+DISTRIBUTIONS = {"normal", "uniform"}
+VARIABLE_TYPES = {"R", "C", "L", "V", "I"}
+DEFAULT_PERCENTILES = (5, 50, 95)
+
+
+def parse_distributions(components, specs):
+    # specs: {name: {"dist": "normal" | "uniform", "tolerance": 0.05, "sigma": optional}}
+    by_name = {comp.name: comp for comp in components}
+    distributions = {}
+    for name in sorted(specs):
+        comp = by_name.get(name)
+        if comp is None:
+            raise ValueError(f"Unknown component: {name}")
+        if comp.type not in VARIABLE_TYPES:
+            raise ValueError(f"{name} has no value that can be varied")
+        spec = specs[name] or {}
+        dist = spec.get("dist", "normal")
+        if dist not in DISTRIBUTIONS:
+            raise ValueError(f"Unsupported distribution: {dist}")
+        tolerance = float(spec.get("tolerance", 0.05))
+        sigma = float(spec.get("sigma", tolerance / 3))
+        if not 0 <= tolerance < 1 or sigma < 0:
+            raise ValueError(f"Invalid tolerance for {name}")
+        distributions[name] = {"dist": dist, "tolerance": tolerance, "sigma": sigma}
+    if not distributions:
+        raise ValueError("No component distributions given")
+    return distributions
+
+
+def sample_factors(distributions, n_samples, seed):
+    # (varied components, n_samples); rows follow the (sorted) order of distributions
+    rng = np.random.default_rng(seed)
+    factors = np.empty((len(distributions), n_samples))
+    for row, spec in enumerate(distributions.values()):
+        if spec["dist"] == "normal":
+            factors[row] = 1 + spec["sigma"] * rng.standard_normal(n_samples)
+        else:
+            factors[row] = 1 + rng.uniform(-spec["tolerance"], spec["tolerance"], n_samples)
+    # a wide normal can cross zero; keep every value on its nominal side
+    return np.maximum(factors, 1e-6)
+
+
+def _perturbed(components, distributions, factors, col):
+    rows = {name: row for row, name in enumerate(distributions)}
+    return [
+        comp.model_copy(update={"value": comp.value * factors[rows[comp.name], col]}) if comp.name in rows else comp
+        for comp in components
+    ]
+
+
+def _collect(series, key, col, n_samples, values, shape=()):
+    series.setdefault(key, np.full((n_samples,) + shape, np.nan))[col] = values
+
+
+def dc_chunk(components, distributions, n_samples, seed):
+    factors = sample_factors(distributions, n_samples, seed)
+
+    if settings.DC_ENGINE != "ngspice":
+        try:
+            system = mna.MNASystem(components, sim.prefix_map)
+            values = np.repeat(system.values[:, None], n_samples, axis=1)
+            values[[system.names.index(name) for name in distributions]] *= factors
+            x = system.solve_batch(values, settings.MC_DENSE_MAX_SIZE)
+            return {
+                "node_voltages": dict(zip((node.lower() for node in system.node_index), x[:system.num_nodes])),
+                "component_currents": dict(zip(system.names, system.currents(x, values))),
+            }
+        except mna.UnsupportedCircuit as e:
+            if settings.DC_ENGINE == "native":
+                raise ValueError(str(e))
+            sim.logger.debug("Native Monte Carlo not applicable (%s), using ngspice", e)
+
+    extractor = sim.DCExtractor(components)
+    rows = [extractor.names.index(name) for name in distributions]
+    node_voltages = {}
+    component_currents = {}
+    for col in range(n_samples):
+        values = extractor.values.copy()
+        values[rows] *= factors[:, col]
+        result = extractor.extract(sim.run_operating_point(_perturbed(components, distributions, factors, col)), values)
+        for node, v in result["node_voltages"].items():
+            _collect(node_voltages, node, col, n_samples, v)
+        for name, i in result["component_currents"].items():
+            _collect(component_currents, name, col, n_samples, i)
+    return {"node_voltages": node_voltages, "component_currents": component_currents}
+
+
+def transient_chunk(components, distributions, n_samples, seed, step_time, end_time, grid_points):
+    # Each sample is resampled onto the same uniform time grid so samples can be stacked
+    factors = sample_factors(distributions, n_samples, seed)
+    grid = np.linspace(0.0, end_time, grid_points)
+    node_voltages = {}
+    for col in range(n_samples):
+        waveforms = sim.run_transient(_perturbed(components, distributions, factors, col), step_time, end_time)
+        for node, v in waveforms["voltages"].items():
+            _collect(node_voltages, node, col, n_samples, np.interp(grid, waveforms["time"], v), (grid_points,))
+    return {"node_voltages": node_voltages}
+
+
+def summarize(samples, percentiles):
+    # samples: (n_samples,) or (n_samples, points); statistics over the sample axis
+    quantiles = np.nanpercentile(samples, percentiles, axis=0)
+    return {
+        "mean": np.nanmean(samples, axis=0).tolist(),
+        "std": np.nanstd(samples, axis=0).tolist(),
+        "min": np.nanmin(samples, axis=0).tolist(),
+        "max": np.nanmax(samples, axis=0).tolist(),
+        "percentiles": {f"{p:g}": q.tolist() for p, q in zip(percentiles, quantiles)},
+    }
+
+
+def _merge(results, field):
+    keys = dict.fromkeys(key for result in results for key in result.get(field, {}))
+    return {key: np.concatenate([result[field][key] for result in results]) for key in keys}
+
+
+def summarize_chunks(results, percentiles):
+    # {field: {key: stats}} over all chunk results
+    summary = {}
+    for field in ("node_voltages", "component_currents"):
+        merged = _merge(results, field)
+        if merged:
+            summary[field] = {key: summarize(samples, percentiles) for key, samples in merged.items()}
+    return summary
+
+
+def accumulate(running, values):
+    # running: {key: (count, mean, m2)}, updated in place with one chunk's samples
+    # (Chan et al. pairwise update of Welford's mean / sum of squared deviations)
+    for key, v in values.items():
+        v = v[~np.isnan(v)]
+        if not v.size:
+            continue
+        n_b, mean_b = v.size, float(v.mean())
+        m2_b = float(((v - mean_b) ** 2).sum())
+        n_a, mean_a, m2_a = running.get(key, (0, 0.0, 0.0))
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        running[key] = (n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n)
+
+
+def resolve_seed(seed):
+    # no seed given: pick one and report it, so the run can be reproduced later
+    if seed is None:
+        return int(np.random.SeedSequence().generate_state(1)[0])
+    return int(seed)
+
+
+def plan_chunks(n_samples, seed, chunk_size):
+    counts = [min(chunk_size, n_samples - start) for start in range(0, n_samples, chunk_size)]
+    return list(zip(counts, np.random.SeedSequence(seed).spawn(len(counts))))
+
+
+def _line(payload):
+    return json.dumps(payload, separators=(",", ":")) + "\n"
+
+
+async def stream_monte_carlo(job, components, distributions, n_samples, seed, chunk_size, percentiles, extra=()):
+    # Async generator of NDJSON lines:
+    #   {"type": "progress", "samples_done": k, "samples": n, ...}       one per finished chunk
+    #   {"type": "result", "seed": s, "node_voltages": {node: stats}, ...}
+    #   or {"type": "error", "detail": "..."}
+    # DC progress lines carry the running mean/std of every node voltage.
+    chunks = plan_chunks(n_samples, seed, chunk_size)
+    results = [None] * len(chunks)
+    # never queue more chunks than there are workers, so other requests still get through
+    limit = asyncio.Semaphore(simulation_executor.max_workers)
+
+    async def run_chunk(index, count, chunk_seed):
+        async with limit:
+            return index, await simulation_executor.run(job, components, distributions, count, chunk_seed, *extra)
+
+    tasks = [asyncio.ensure_future(run_chunk(i, count, chunk_seed)) for i, (count, chunk_seed) in enumerate(chunks)]
+    done = 0
+    # running DC node statistics, updated once per chunk instead of re-merging every sample
+    running = {}
+    try:
+        for next_chunk in asyncio.as_completed(tasks):
+            index, result = await next_chunk
+            results[index] = result
+            done += chunks[index][0]
+            progress = {"type": "progress", "samples_done": done, "samples": n_samples}
+            if job is dc_chunk:
+                accumulate(running, result["node_voltages"])
+                progress["mean"] = {node: mean for node, (_, mean, _) in running.items()}
+                progress["std"] = {node: (m2 / n) ** 0.5 for node, (n, _, m2) in running.items()}
+            yield _line(progress)
+
+        summary = {"type": "result", "samples": n_samples, "seed": seed, "percentiles": list(percentiles)}
+        # percentiles need every sample: sort them off the event loop
+        summary.update(await asyncio.get_running_loop().run_in_executor(None, summarize_chunks, results, percentiles))
+        if job is transient_chunk:
+            summary["time"] = np.linspace(0.0, extra[1], extra[2]).tolist()
+        yield _line(summary)
+    except (QueueFullError, JobTimeoutError, WorkerCrashedError, ValueError) as e:
+        yield _line({"type": "error", "detail": str(e)})
+    finally:
+        for task in tasks:
+            task.cancel()
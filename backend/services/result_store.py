@@ -0,0 +1,153 @@
+import datetime
+import hashlib
+import json
+import logging
+import time
+import zlib
+
+from bson import Binary, ObjectId
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from config import settings
+from config.db import results_collection, simulations_collection, with_retry
+
+# Simulation results persisted in MongoDB, second level behind the in-memory
+# result_cache of routers/simulate.py.
+#
+# A result is stored once per (circuit_fingerprint, analysis, parameters): the
+# fingerprint covers everything that reaches the netlist, so reopening a saved
+# circuit, or only moving parts around, finds the previous run instead of simulating
+# again. Values are zlib-compressed JSON ("json") or raw response bytes plus JSON
+# metadata ("binary", e.g. transient waveform buffers). Documents expire after
+# RESULT_STORE_TTL_SECONDS (TTL index in config/db.py).
+#
+# Keys include RESULT_VERSION: bump it with any change to the simulation code that can
+# change results, stored results of the old code are then never read again and expire.
+#
+# A saved circuit links to its results per analysis, together with the revision
+# they were computed for; /simulate/load?results=true returns the ones that match the
+# circuit's current revision. A result is only linked when the simulated circuit has
+# the fingerprint stored with that revision (services/circuit_store.py).
+#
+# The store is best effort: a database error is logged and the request simulates
+# (or answers) as if nothing was stored. After a connection failure the store is
+# skipped for RESULT_STORE_RETRY_SECONDS, so an unreachable database costs one server
+# selection timeout per interval instead of one per request.
+
+RESULT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+_unavailable_until = 0.0
+
+
+def result_key(fingerprint, analysis, parameters) -> str:
+    payload = json.dumps([RESULT_VERSION, fingerprint, analysis, parameters],
+                         sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, tuple):
+        content, metadata = value
+        return "binary", zlib.compress(content), metadata
+    return "json", zlib.compress(json.dumps(value, default=float).encode("utf-8")), None
+
+
+def _available():
+    return settings.RESULT_STORE_ENABLED and time.monotonic() >= _unavailable_until
+
+
+def _failed(error, message, *args):
+    global _unavailable_until
+    logger.warning(message, *args, exc_info=error)
+    if isinstance(error, ConnectionFailure):
+        _unavailable_until = time.monotonic() + settings.RESULT_STORE_RETRY_SECONDS
+
+
+def _decode(doc):
+    data = zlib.decompress(doc["data"])
+    if doc["kind"] == "binary":
+        return data, doc["metadata"]
+    return json.loads(data)
+
+
+async def fetch(key):
+    if not _available():
+        return None
+    try:
+        doc = await with_retry(lambda: results_collection.find_one({"_id": key}))
+    except PyMongoError as e:
+        _failed(e, "Result store lookup failed")
+        return None
+    return _decode(doc) if doc else None
+
+
+async def put(key, fingerprint, analysis, parameters, value):
+    if not _available():
+        return
+    kind, data, metadata = _encode(value)
+    if len(data) > settings.RESULT_STORE_MAX_BYTES:
+        return
+    doc = {
+        "fingerprint": fingerprint,
+        "analysis": analysis,
+        "parameters": parameters,
+        "kind": kind,
+        "data": Binary(data),
+        "metadata": metadata,
+        "created_at": datetime.datetime.utcnow(),
+    }
+    try:
+        await results_collection.replace_one({"_id": key}, doc, upsert=True)
+    except PyMongoError as e:
+        _failed(e, "Result store write failed")
+
+
+async def link(circuit_id: ObjectId, user_id: ObjectId, revision: int, fingerprint: str, analysis: str, key: str):
+    # Records key as the circuit's latest `analysis` result for `revision`; a no-op when
+    # the circuit is not the user's, has moved on to another revision, or that revision is
+    # not the circuit that was simulated (fingerprint from circuit_store.saved_fingerprint).
+    # Documents saved before revisions existed have no "revision" field and count as 1;
+    # documents saved before fingerprints were stored only link again after their next save.
+    if not _available():
+        return
+    query = {"_id": circuit_id, "user_id": user_id, "revision": revision, "fingerprint": fingerprint}
+    if revision == 1:
+        query["revision"] = {"$in": [1, None]}
+    try:
+        await simulations_collection.update_one(
+            query, {"$set": {f"results.{analysis}": {"key": key, "revision": revision}}}
+        )
+    except PyMongoError as e:
+        _failed(e, "Could not link result to circuit %s", circuit_id)
+
+
+async def linked_results(simulation_doc):
+    # -> {analysis: {"parameters", ...}} for the current revision: json results add the
+    # stored response fields, binary ones "data" (bytes) and "metadata"
+    revision = simulation_doc.get("revision", 1)
+    links = {analysis: entry["key"] for analysis, entry in (simulation_doc.get("results") or {}).items()
+             if entry.get("revision") == revision}
+    if not links or not _available():
+        return {}
+    try:
+        docs = await with_retry(lambda: results_collection.find({"_id": {"$in": list(links.values())}}).to_list(None))
+    except PyMongoError as e:
+        _failed(e, "Result store lookup failed")
+        return {}
+    by_key = {doc["_id"]: doc for doc in docs}
+
+    results = {}
+    for analysis, key in links.items():
+        doc = by_key.get(key)
+        if doc is None:
+            continue  # expired
+        entry = {"parameters": doc["parameters"]}
+        if doc["kind"] == "binary":
+            data, metadata = _decode(doc)
+            entry.update({"data": data, "metadata": metadata})
+        else:
+            # the stored endpoint response, e.g. {"result", "mappings", "components_mapping"} for dc
+            entry.update(_decode(doc))
+        results[analysis] = entry
+    return results
@@ -1,185 +1,402 @@
 import PySpice
-import PySpice.Logging.Logging as Logging
-from PySpice.Spice.Netlist import Circuit, SubCircuit
+import logging
 import PySpice.Unit as Unit
 import io
+import itertools
+from operator import attrgetter
 import matplotlib.pyplot as plt
+import numpy as np
+import utils.waveform as waveform
+import services.simulator_pool as simulator_pool
+import services.mna as mna
+import services.transient_plan as transient_plan
+from services.circuit_builder import build_circuit, circuit_nodes, element_name, flatten, prefix_map
+from config import settings
+from utils.decimation import minmax_decimate
 
-unit_map = {
-    "ohm": Unit.u_Ohm,
-    "volt": Unit.u_V,
-    "farad": Unit.u_F,
-    "henry": Unit.u_H,
-    "ampere": Unit.u_A
-}
-
-prefix_map = {
-    "p": 1e-12,
-    "n": 1e-9,
-    "u": 1e-6,
-    "m": 1e-3,
-    "": 1,
-    "k": 1e3,
-    "M": 1e6,
-    "G": 1e9
-}
-
-def convert_to_pyspice(value: float, prefix: str, unit_type: str):
-    prefix = prefix or ""
-    unit_type = unit_type.lower()
-    
-    if unit_type not in unit_map:
-        raise ValueError(f"Unsupported unit: {unit_type}")
-    if prefix not in prefix_map:
-        raise ValueError(f"Unsupported prefix: {prefix}")
-    
-    factor = prefix_map[prefix]
-    unit_constructor = unit_map[unit_type]
-    
-
-    return (value * factor) @ unit_constructor
+logger = logging.getLogger(__name__)
+# elements ngspice can step in one .dc analysis whose results PySpice reads back (v-sweep / i-sweep)
+SWEEP_SOURCES = {"V", "I"}
 
 def build_and_simulate_DC(components):
-    logger = Logging.setup_logging()
-    circuit = Circuit('Generated Circuit')
-
-    for comp in components:
-        value_with_unit = convert_to_pyspice(comp.value, comp.prefix, comp.unit)
-        if comp.type == "R":
-            circuit.R(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "V":
-            circuit.V(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "C":
-            circuit.C(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "L":
-            circuit.L(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "I":
-            circuit.I(comp.name, comp.node1, comp.node2, value_with_unit)
+    # DC_ENGINE: "auto" tries the in-process MNA solver and falls back to ngspice,
+    # "native" only uses MNA, "ngspice" always goes through the simulator
+    if settings.DC_ENGINE != "ngspice":
+        try:
+            return solve_dc_native(components)
+        except mna.UnsupportedCircuit as e:
+            if settings.DC_ENGINE == "native":
+                raise ValueError(str(e))
+            logger.debug("Native DC not applicable (%s), using ngspice", e)
+    return simulate_DC_ngspice(components)
+
+def solve_dc_native(components):
+    # subcircuits are flattened for the MNA solver; like ngspice, currents are only
+    # reported for the top-level components (None for subcircuit instances)
+    if not any(comp.subcircuit is not None for comp in components):
+        return mna.solve_dc(components, prefix_map)
+    result = mna.solve_dc(flatten(components), prefix_map)
+    currents = result["component_currents"]
+    result["component_currents"] = {comp.name: currents.get(comp.name) for comp in components}
+    return result
+
+def sweep_values(spec):
+    # {"values": [...]} or {"start": a, "stop": b, "points": n, "scale": "linear" | "log"}
+    # the point count is checked before any array is built: this runs on the event loop
+    if not isinstance(spec, dict):
+        raise ValueError("Sweep needs either 'values' or 'start', 'stop' and 'points'")
+    if spec.get("values") is not None:
+        if isinstance(spec["values"], list) and len(spec["values"]) > settings.SWEEP_MAX_POINTS:
+            raise ValueError(f"Sweep is limited to {settings.SWEEP_MAX_POINTS} points")
+        try:
+            values = np.asarray(spec["values"], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Sweep values must be numbers")
+    else:
+        try:
+            start, stop, points = float(spec["start"]), float(spec["stop"]), int(spec["points"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Sweep needs either 'values' or 'start', 'stop' and 'points'")
+        if points < 1:
+            raise ValueError("Sweep needs at least one value")
+        if points > settings.SWEEP_MAX_POINTS:
+            raise ValueError(f"Sweep is limited to {settings.SWEEP_MAX_POINTS} points")
+        scale = spec.get("scale", "linear")
+        if scale == "linear":
+            values = np.linspace(start, stop, points)
+        elif scale == "log":
+            if start <= 0 or stop <= 0:
+                raise ValueError("Logarithmic sweeps need positive start and stop values")
+            values = np.geomspace(start, stop, points)
         else:
-            raise ValueError(f"Unsupported component type: {comp.type}")
+            raise ValueError(f"Unsupported sweep scale: {scale}")
+
+    if values.ndim != 1 or values.shape[0] == 0:
+        raise ValueError("Sweep needs at least one value")
+    if not np.isfinite(values).all():
+        raise ValueError("Sweep values must be finite numbers")
+    if values.shape[0] > settings.SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep is limited to {settings.SWEEP_MAX_POINTS} points")
+    return values
+
+def linear_step(values):
+    # step of an evenly spaced sweep (what a .dc line can express), else None
+    if len(values) < 2 or values[-1] == values[0]:
+        return None
+    step = (values[-1] - values[0]) / (len(values) - 1)
+    grid = values[0] + step * np.arange(len(values))
+    return step if np.allclose(values, grid, rtol=1e-9, atol=1e-12 * np.abs(values).max()) else None
+
 
-    print("CIRCUIT")
-    print(circuit)
-    simulator = circuit.simulator(temperature=25, nominal_temperature=25)
-    analysis = simulator.operating_point()
+def run_dc_sweep(components, element, values, step):
+    circuit = build_circuit(components)
+    session = simulator_pool.get_session()
+    simulator = session.simulator(circuit)
+    with session.solving():
+        return simulator.dc(**{element: slice(float(values[0]), float(values[-1]), float(step))})
 
-    results = {}
-    for node in analysis.nodes.values():
-        results[str(node)] = float(node.item())
 
+def build_and_simulate_sweep(components, name, values):
+    # Whole sweep as one job: native multi-RHS MNA when possible, otherwise a single
+    # ngspice .dc analysis for an evenly spaced source sweep, and one ngspice operating
+    # point per value on the warm worker session for the rest (resistor sweeps, whose
+    # .dc results PySpice cannot read, and log / arbitrary value lists).
+    if settings.DC_ENGINE != "ngspice":
+        try:
+            return mna.sweep_dc(components, prefix_map, name, values)
+        except mna.UnsupportedCircuit as e:
+            if settings.DC_ENGINE == "native":
+                raise ValueError(str(e))
+            logger.debug("Native sweep not applicable (%s), using ngspice", e)
+
+    if not any(comp.name == name for comp in components):
+        raise ValueError(f"Unknown component: {name}")
+
+    extractor = DCExtractor(components)
+    idx = extractor.names.index(name)
+    comp = components[idx]
+    step = linear_step(values) if comp.type in SWEEP_SOURCES else None
+    if step is not None:
+        analysis = run_dc_sweep(components, element_name(comp), values, step)
+        # ngspice may round one extra point onto the end of the range
+        swept = np.asarray(analysis.sweep, dtype=np.float64)[:len(values)]
+        if len(swept) == len(values) and np.allclose(swept, values, rtol=1e-9, atol=1e-12 * np.abs(values).max()):
+            point_values = np.repeat(extractor.values[:, None], len(values), axis=1)
+            point_values[idx] = values
+            result = extractor.extract_sweep(analysis, point_values)
+            return {"values": np.asarray(values, dtype=np.float64).tolist(), **result}
+        logger.debug("ngspice .dc returned other points than requested, sweeping point by point")
+
+    node_voltages = {}
     component_currents = {}
-    for comp in components:
-        if comp.type == "R":
-            # node voltages
-            V1 = results.get(str(comp.node1).lower(), 0.0)
-            V2 = results.get(str(comp.node2).lower(), 0.0)
-            # resistor value in ohms
-            R_value = comp.value * prefix_map.get(comp.prefix or "", 1)
-            if R_value == 0:
-                I = 0.0
-            else:
-                I = (V1 - V2) / R_value
-            component_currents[comp.name] = I  # positive = node1 → node2
-
-        elif comp.type == "V":
-            try:
-                I = -float(analysis.branches["v" + comp.name][0])
-            except Exception:
-                I = None
-            component_currents[comp.name] = I
-        elif comp.type == "I":
-        # Current source: value already given by user 
-            I = comp.value * prefix_map.get(comp.prefix or "", 1)
-            component_currents[comp.name] = I
-
-        elif comp.type in ("C", "L"):
-            # For DC operating point:
-            # - Capacitors = open circuit → 0 A
-            # - Inductors = short circuit → branch current if exists
-            if comp.type == "C":
-                I = 0.0
-            else:  # L
-                try:
-                    I = float(analysis.branches[comp.name][0])
-                except Exception:
-                    I = None
-            component_currents[comp.name] = I
-
-    return {"node_voltages": results, "component_currents": component_currents}
-
-def build_and_simulate_transient(components, step_time, end_time):
-    logger = Logging.setup_logging()
-    circuit = Circuit('Generated Circuit')
-
-    for comp in components:
-        print(comp.type)
-        value_with_unit = convert_to_pyspice(comp.value, comp.prefix, comp.unit)
-        if comp.type == "R":
-            circuit.R(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "V":
-            circuit.V(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "C":
-            circuit.C(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "L":
-            circuit.L(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type == "I":
-            circuit.I(comp.name, comp.node1, comp.node2, value_with_unit)
-        elif comp.type== "PV": 
-            initial_value = convert_to_pyspice(comp.initial_value[0], comp.initial_value[1], comp.initial_value[2])
-            pulse_value = convert_to_pyspice(comp.pulse_value, "", "volt")
-            circuit.PulseVoltageSource(comp.name, 
-                                        comp.node1,
-                                        comp.node2, 
-                                        initial_value, 
-                                        pulse_value, 
-                                        pulse_width=comp.pulse_width@Unit.u_s, 
-                                        period=comp.period@Unit.u_s)
-            
-        else:
-            raise ValueError(f"Unsupported component type: {comp.type}")
-        
-    simulator = circuit.simulator(temperature=25, nominal_temperature=25)
+    for point, value in enumerate(values):
+        swept = [
+            comp.model_copy(update={"value": float(value), "prefix": ""}) if comp.name == name else comp
+            for comp in components
+        ]
+        point_values = extractor.values.copy()
+        point_values[idx] = value
+        result = extractor.extract(run_operating_point(swept), point_values)
+        for node, v in result["node_voltages"].items():
+            node_voltages.setdefault(node, [None] * len(values))[point] = v
+        for comp_name, i in result["component_currents"].items():
+            component_currents.setdefault(comp_name, [None] * len(values))[point] = i
+
+    return {
+        "values": np.asarray(values, dtype=np.float64).tolist(),
+        "node_voltages": node_voltages,
+        "component_currents": component_currents,
+    }
+
+def run_operating_point(components):
+    circuit = build_circuit(components)
+    logger.debug("CIRCUIT\n%s", circuit)
+    session = simulator_pool.get_session()
+    simulator = session.simulator(circuit)
+    with session.solving():
+        return simulator.operating_point()
+
+
+def simulate_DC_ngspice(components):
+    return DCExtractor(components).extract(run_operating_point(components))
+
+
+class DCExtractor:
+    # Array-backed post-processing of ngspice operating points for one component list.
+    #
+    # Built once: element types, pin -> node index arrays and SI values. extract() then
+    # gathers the node voltages into one array, computes every resistor current as a
+    # single (V[n1] - V[n2]) / R over the index arrays and reads the V/L/E branch vectors
+    # in one pass. Sweeps and Monte Carlo samples that solve the same topology reuse a
+    # single extractor and only pass their own element values.
+
+    def __init__(self, components):
+        count = len(components)
+        # one C-level pass per field instead of a Python loop over components
+        column = lambda field: list(map(attrgetter(field), components))
+        self.names = column("name")
+        self.types = np.array(column("type"), dtype=str)
+
+        # number the distinct pins once; ngspice reports lowercase node names
+        pins = column("node1") + column("node2")
+        positions = dict(zip(dict.fromkeys(pins), itertools.count()))
+        self.pins = [pin.lower() for pin in positions]
+        pin_ids = np.fromiter(map(positions.__getitem__, pins), dtype=np.int64, count=2 * count)
+        self.n1, self.n2 = pin_ids[:count], pin_ids[count:]
+
+        # prefix None / unknown falls back to 1, like the previous per-component lookup
+        scale = np.fromiter(map(prefix_map.get, column("prefix"), itertools.repeat(1)), dtype=np.float64, count=count)
+        self.values = np.fromiter(map(attrgetter("value"), components), dtype=np.float64, count=count) * scale
+
+        self.branch = np.flatnonzero(np.isin(self.types, ("V", "PV", "L", "E")))
+        self.branch_keys = [element_name(components[k]).lower() for k in self.branch.tolist()]
+        # ngspice reports source current flowing into the + terminal, flip it for sources
+        self.branch_sign = np.where(self.types[self.branch] == "L", 1.0, -1.0)
+
+    def _currents(self, node_names, voltages, values, branch_currents):
+        # voltages: (nodes + 1, ...) with the trailing 0 V slot, values: (components, ...),
+        # branch_currents: (branch elements, ...); the trailing axes are sweep points, if any
+        index = dict(zip(node_names, range(len(node_names))))
+        lookup = np.fromiter(map(index.get, self.pins, itertools.repeat(len(node_names))), dtype=np.int64, count=len(self.pins))
+        n1, n2 = lookup[self.n1], lookup[self.n2]
+
+        currents = np.full((len(self.names),) + voltages.shape[1:], np.nan)
+        r = self.types == "R"
+        drop = voltages[n1[r]] - voltages[n2[r]]
+        # positive = node1 -> node2; a 0 Ohm resistor reports 0 A
+        currents[r] = np.divide(drop, values[r], out=np.zeros_like(drop), where=values[r] != 0)
+        # Current source: value already given by user
+        i = self.types == "I"
+        currents[i] = values[i]
+        # DC operating point: capacitors are open circuits
+        currents[self.types == "C"] = 0.0
+        currents[self.branch] = self.branch_sign.reshape((-1,) + (1,) * (voltages.ndim - 1)) * branch_currents
+        return currents
+
+    def extract(self, analysis, values=None):
+        values = self.values if values is None else values
+        node_names = list(analysis.nodes)
+        # trailing 0 V slot for ground and for pins ngspice does not report
+        voltages = np.append(
+            np.fromiter((wave.item() for wave in analysis.nodes.values()), dtype=np.float64, count=len(node_names)), 0.0
+        )
+        branches = analysis.branches
+        currents = self._currents(node_names, voltages, values, np.fromiter(
+            (branches[key].item() if key in branches else np.nan for key in self.branch_keys),
+            dtype=np.float64, count=len(self.branch_keys),
+        ))
+
+        component_currents = dict(zip(self.names, currents.tolist()))
+        # missing branch vectors are reported as None
+        for k in np.flatnonzero(np.isnan(currents)).tolist():
+            component_currents[self.names[k]] = None
+        return {"node_voltages": dict(zip(node_names, voltages[:-1].tolist())), "component_currents": component_currents}
+
+    def extract_sweep(self, analysis, values):
+        # .dc analysis: values (components, points) holds every element value per sweep point;
+        # -> {"node_voltages": {node: [...]}, "component_currents": {name: [...]}}, like extract()
+        # per point (the sweep variable itself is not a node)
+        points = values.shape[1]
+        node_names = [node for node in analysis.nodes if not node.endswith("-sweep")]
+        voltages = np.vstack([np.asarray(analysis.nodes[node], dtype=np.float64) for node in node_names] + [np.zeros(points)])
+        branches = analysis.branches
+        branch_currents = np.array(
+            [np.asarray(branches[key], dtype=np.float64) if key in branches else np.full(points, np.nan)
+             for key in self.branch_keys],
+            dtype=np.float64,
+        ).reshape(len(self.branch_keys), points)
+        currents = self._currents(node_names, voltages, values, branch_currents)
+
+        rows = currents.tolist()
+        # missing branch vectors are reported as None
+        for k in np.flatnonzero(np.isnan(currents).any(axis=1)).tolist():
+            rows[k] = [None if np.isnan(x) else x for x in rows[k]]
+        return {"node_voltages": dict(zip(node_names, voltages[:-1].tolist())),
+                "component_currents": dict(zip(self.names, rows))}
+
+
+def run_transient(components, step_time, end_time, reltol=None, method=None):
+    # waveforms plus "plan": the effective settings from transient_plan.plan_transient()
+    plan = transient_plan.plan_transient(components, step_time, end_time, reltol, method)
+    circuit = build_circuit(components)
+    session = simulator_pool.get_session()
+    simulator = session.simulator(circuit)
 
     # ---- Run transient analysis ----
-    step_time_val = step_time @ Unit.u_s
-    end_time_val = end_time @ Unit.u_s
-    analysis = simulator.transient(step_time=step_time_val, end_time=end_time_val)
-    
-    # print(len(analysis.time))
-    # # ---- Extract results ----
-    # time_data = [float(t) for t in analysis.time]
-    # node_voltages = {}
-
-    # # Extract voltage for each node
-    # for node in circuit.node_names:
-    #     if node == '0':  # skip ground
-    #         continue
-    #     try:
-    #         node_voltages[node] = [float(v) for v in analysis[node]]
-    #     except KeyError:
-    #         logger.warning(f"Node {node} not found in analysis results.")
-
-    # # ---- Prepare frontend payload ----
-    # result = {
-    #     "time": time_data,
-    #     "voltages": node_voltages,
-    #     "metadata": {
-    #         "step_time_us": step_time,
-    #         "end_time_us": end_time,
-    #         "num_points": len(time_data),
-    #     },
-    # }
-
-    # return result
-    plt.figure(figsize=(10, 5))
-    for node in circuit.node_names:
-        if node == '0':
-            continue
+    with session.solving():
+        analysis = transient_plan.apply_plan(simulator, plan)
+
+    waveforms = extract_waveforms(circuit_nodes(components), analysis)
+    waveforms["plan"] = plan
+    return waveforms
+
+
+def build_and_simulate_transient(components, step_time, end_time, output_format="binary", dtype="float32", max_points=None,
+                                 reltol=None, method=None):
+    waveforms = run_transient(components, step_time, end_time, reltol, method)
+    original_points = int(waveforms["time"].shape[0])
+    if max_points:
+        waveforms["time"], waveforms["voltages"] = minmax_decimate(
+            waveforms["time"], waveforms["voltages"], max_points
+        )
+    points = {
+        "original_points": original_points,
+        "num_points": int(waveforms["time"].shape[0]),
+        "plan": waveforms["plan"],
+    }
+
+    if output_format == "png":
+        return render_waveforms_png(waveforms), points
+
+    content = waveform.pack_waveforms(
+        "time",
+        waveforms["time"],
+        waveforms["voltages"],
+        dtype=dtype,
+        metadata={
+            "step_time": step_time,
+            "end_time": end_time,
+            **points,
+        },
+    )
+    return content, points
+
+
+AC_VARIATIONS = {"dec", "oct", "lin"}
+COMPLEX_DTYPES = {"float32": "complex64", "float64": "complex128"}
+
+
+def ac_point_count(variation, points, start_frequency, stop_frequency):
+    # Number of frequencies ngspice will produce for an .ac line
+    if variation == "lin":
+        return points
+    ratio = stop_frequency / start_frequency
+    per = np.log10(ratio) if variation == "dec" else np.log2(ratio)
+    return int(np.floor(per * points)) + 1
+
+
+def build_ac_circuit(components):
+    if not any(comp.type in ("V", "I") and comp.ac_magnitude for comp in components):
+        raise ValueError("AC analysis needs at least one source with an AC magnitude")
+    return build_circuit(components)
+
+
+def build_and_simulate_ac(components, variation, points, start_frequency, stop_frequency,
+                          output="complex", dtype="float32"):
+    # output="complex": one complex series per node (complex64/complex128 FEMW buffer)
+    # output="polar": "mag(node)" in dB and "phase(node)" in unwrapped degrees per node
+    if variation not in AC_VARIATIONS:
+        raise ValueError(f"Unsupported AC variation: {variation}")
+    if output not in ("complex", "polar"):
+        raise ValueError(f"Unsupported AC output: {output}")
+    if dtype not in COMPLEX_DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+    if points < 1 or start_frequency <= 0 or stop_frequency < start_frequency:
+        raise ValueError("Invalid AC sweep range")
+    if ac_point_count(variation, points, start_frequency, stop_frequency) > settings.AC_MAX_POINTS:
+        raise ValueError(f"AC sweep exceeds {settings.AC_MAX_POINTS} points")
+
+    circuit = build_ac_circuit(components)
+    session = simulator_pool.get_session()
+    simulator = session.simulator(circuit)
+    with session.solving():
+        analysis = simulator.ac(
+            variation=variation,
+            number_of_points=points,
+            start_frequency=start_frequency @ Unit.u_Hz,
+            stop_frequency=stop_frequency @ Unit.u_Hz,
+        )
+
+    # frequency comes back as a complex vector with zero imaginary part
+    frequency = np.real(np.asarray(analysis.frequency))
+    nodes = []
+    for node in circuit_nodes(components):
+        try:
+            nodes.append((node, np.asarray(analysis[node], dtype=np.complex128)))
+        except (KeyError, IndexError):
+            logger.warning(f"Node {node} not found in analysis results.")
+    names = [node for node, _ in nodes]
+    response = np.vstack([values for _, values in nodes]) if nodes else np.empty((0, frequency.shape[0]))
+
+    metadata = {
+        "variation": variation,
+        "points": points,
+        "start_frequency": start_frequency,
+        "stop_frequency": stop_frequency,
+        "output": output,
+    }
+    if output == "complex":
+        return waveform.pack_waveforms("frequency", frequency, dict(zip(names, response)),
+                                       dtype=COMPLEX_DTYPES[dtype], metadata=metadata)
+
+    # whole (nodes, points) block at once
+    magnitude_db = 20 * np.log10(np.maximum(np.abs(response), np.finfo(np.float64).tiny))
+    phase_deg = np.degrees(np.unwrap(np.angle(response), axis=1))
+    series = {}
+    for node, mag, phase in zip(names, magnitude_db, phase_deg):
+        series[f"mag({node})"] = mag
+        series[f"phase({node})"] = phase
+    return waveform.pack_waveforms("frequency", frequency, series, dtype=dtype, metadata=metadata)
+
+
+def extract_waveforms(nodes, analysis):
+    # Keep everything as NumPy arrays, no per-sample float() conversion
+    time_data = np.asarray(analysis.time, dtype=np.float64)
+    node_voltages = {}
+    for node in nodes:
         try:
-            plt.plot(analysis.time, analysis[node], label=f"Node {node}")
-        except KeyError:
+            node_voltages[node] = np.asarray(analysis[node], dtype=np.float64)
+        except (KeyError, IndexError):
             logger.warning(f"Node {node} not found in analysis results.")
 
+    return {"time": time_data, "voltages": node_voltages}
+
+
+def render_waveforms_png(waveforms):
+    plt.figure(figsize=(10, 5))
+    for node, values in waveforms["voltages"].items():
+        plt.plot(waveforms["time"], values, label=f"Node {node}")
+
     plt.xlabel("Time (s)")
     plt.ylabel("Voltage (V)")
     plt.title("Transient Analysis")
@@ -194,4 +411,4 @@ def build_and_simulate_transient(components, step_time, end_time):
 
     # ---- Return raw image bytes ----
 
-    return buf.getvalue()
\ No newline at end of file
+    return buf.getvalue()
@@ -0,0 +1,94 @@
+import os
+import time
+from contextlib import contextmanager
+
+import PySpice.Logging.Logging as Logging
+from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+
+# Warm ngspice sessions for the simulation worker processes.
+#
+# Every worker of services.executor owns exactly one SimulatorSession: the shared
+# library is loaded and initialised once (in the pool initializer), PySpice logging
+# is configured once, and each job only loads its netlist and solves. After every job
+# the loaded circuit and its output plots are dropped so state never leaks from one
+# request into the next. A session that raised is fully reset before it is reused,
+# and the executor replaces the whole worker process after SIM_RECYCLE_AFTER jobs,
+# which also gives a fresh ngspice instance.
+#
+# Timings (instance startup vs. solve) are collected here and shipped back to the
+# API process with every job result by run_job().
+
+logger = None
+_session = None
+
+
+class SimulatorSession:
+
+    def __init__(self):
+        start = time.perf_counter()
+        self.ngspice = NgSpiceShared.new_instance()
+        self.startup_seconds = time.perf_counter() - start
+        self.runs = 0
+        self.errors = 0
+        self._timings = {"startup": self.startup_seconds, "solve": 0.0}
+
+    def simulator(self, circuit):
+        return circuit.simulator(
+            simulator="ngspice-shared",
+            ngspice_shared=self.ngspice,
+            temperature=25,
+            nominal_temperature=25,
+        )
+
+    @contextmanager
+    def solving(self):
+        # Wrap the analysis call: times the solve and resets circuit state afterwards
+        start = time.perf_counter()
+        try:
+            yield self
+        except Exception:
+            self.errors += 1
+            self.reset()
+            raise
+        finally:
+            self._timings["solve"] += time.perf_counter() - start
+        self.runs += 1
+        self.reset()
+
+    def reset(self):
+        try:
+            self.ngspice.remove_circuit()
+            self.ngspice.destroy()
+        except Exception:
+            # nothing loaded (e.g. the netlist failed to parse)
+            pass
+
+    def take_timings(self):
+        timings, self._timings = self._timings, {"solve": 0.0}
+        return timings
+
+
+def init_worker():
+    # ProcessPoolExecutor initializer: configure logging and warm the simulator up front
+    global logger
+    logger = Logging.setup_logging()
+    try:
+        get_session()
+    except OSError:
+        # ngspice library missing: let each job raise the error instead of killing the pool
+        logger.exception("Could not start ngspice in worker")
+
+
+def get_session():
+    global _session
+    if _session is None:
+        _session = SimulatorSession()
+    return _session
+
+
+def run_job(fn, *args):
+    # Executed in the worker: returns fn's result together with this process' timings
+    result = fn(*args)
+    timings = _session.take_timings() if _session is not None else {}
+    timings["pid"] = os.getpid()
+    return result, timings
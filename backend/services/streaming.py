@@ -0,0 +1,174 @@
+import asyncio
+import json
+import queue
+import threading
+
+from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+from PySpice.Spice.Simulation import CircuitSimulation
+
+from config import settings
+from services.circuit_builder import build_circuit
+import services.transient_plan as transient_plan
+
+# Streaming transient analysis.
+#
+# ngspice runs in its own background thread ("bg_run") inside the API process and
+# reports every accepted time point through the send_data callback. Samples are
+# grouped into blocks and handed to the HTTP response through a bounded queue:
+# when the client reads slowly the queue fills up, the callback blocks and ngspice
+# itself pauses, so nothing is buffered without limit. If the client disconnects,
+# the response generator is cancelled and the run is halted.
+#
+# The shared library holds a single simulator state per process, so streams on the
+# same API worker run one after the other.
+#
+# Unlike the other analyses this does not go through the simulation worker pool
+# (services/executor.py): the callback has to hand blocks to the response while the
+# run is in progress, which a pool job cannot do without an extra IPC channel. The
+# cost is one ngspice instance per API process, runs serialized by _stream_lock and
+# not counted in the executor's queue limits.
+
+
+class _Deck(CircuitSimulation):
+    # Only used to render the netlist + analysis lines, never to run anything
+    SIMULATOR = "ngspice"
+
+
+class StreamingNgSpice(NgSpiceShared):
+
+    def __init__(self, ngspice_id=0):
+        super().__init__(ngspice_id=ngspice_id, send_data=True)
+        self.sink = None
+
+    @property
+    def library_path(self):
+        # STREAM_NGSPICE_LIBRARY overrides the libngspice{id}.so name PySpice derives from the id
+        return settings.STREAM_NGSPICE_LIBRARY or super().library_path
+
+    def send_data(self, actual_vector_values, number_of_vectors, ngspice_id):
+        sink = self.sink
+        if sink is not None:
+            sink.push(actual_vector_values)
+        return 0
+
+
+class TransientStream:
+
+    def __init__(self, block_size: int, max_blocks: int):
+        self.block_size = block_size
+        self.blocks = queue.Queue(maxsize=max_blocks)
+        self.cancelled = threading.Event()
+        self.points = 0
+        self._time = []
+        self._voltages = {}
+
+    def push(self, values):
+        # Called from the ngspice background thread for every time point
+        if self.cancelled.is_set():
+            return
+        for name, value in values.items():
+            name = name.lower()
+            if name == "time":
+                self._time.append(value.real)
+            elif not name.endswith("#branch"):
+                if name.startswith("v(") and name.endswith(")"):
+                    name = name[2:-1]
+                self._voltages.setdefault(name, []).append(value.real)
+        if len(self._time) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if not self._time:
+            return
+        block = {"type": "data", "time": self._time, "voltages": self._voltages}
+        self.points += len(self._time)
+        self._time, self._voltages = [], {}
+        # Blocking put is the backpressure: ngspice waits here while the client is slow
+        while not self.cancelled.is_set():
+            try:
+                self.blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+_ngspice = None
+_stream_lock = asyncio.Lock()
+
+
+def get_streaming_ngspice():
+    global _ngspice
+    if _ngspice is None:
+        _ngspice = StreamingNgSpice(ngspice_id=settings.STREAM_NGSPICE_ID)
+    return _ngspice
+
+
+def build_transient_deck(components, step_time, end_time, reltol=None, method=None):
+    # -> (deck text, effective settings from transient_plan.plan_transient())
+    plan = transient_plan.plan_transient(components, step_time, end_time, reltol, method)
+    circuit = build_circuit(components)
+    deck = _Deck(circuit, temperature=25, nominal_temperature=25)
+    transient_plan.apply_plan(deck, plan)
+    return str(deck), plan
+
+
+def _start(ngspice, deck):
+    ngspice.destroy()
+    ngspice.remove_circuit()
+    ngspice.load_circuit(deck)
+    ngspice.run(background=True)
+
+
+def _line(payload):
+    return json.dumps(payload, separators=(",", ":")) + "\n"
+
+
+async def stream_transient(deck, plan=None):
+    # Async generator of NDJSON lines for a deck from build_transient_deck():
+    #   {"type": "data", "time": [...], "voltages": {"n1": [...], ...}}   (repeated)
+    #   {"type": "end", "points": N, "plan": {...}} or {"type": "error", "detail": "..."}
+    # The response has started when this runs, so failures end the stream with an error
+    # line. A run still going after SIM_TIMEOUT_SECONDS is halted ("timeout"), otherwise
+    # it would hold _stream_lock for every later stream.
+    stream = TransientStream(settings.STREAM_BLOCK_SIZE, settings.STREAM_MAX_BLOCKS)
+    loop = asyncio.get_running_loop()
+
+    async with _stream_lock:
+        ngspice = None
+        deadline = loop.time() + settings.SIM_TIMEOUT_SECONDS
+        try:
+            ngspice = get_streaming_ngspice()
+            ngspice.sink = stream
+            await asyncio.to_thread(_start, ngspice, deck)
+            while True:
+                try:
+                    block = stream.blocks.get_nowait()
+                except queue.Empty:
+                    if ngspice.is_running:
+                        if loop.time() > deadline:
+                            # unblock the callback first, halt waits for the background thread
+                            stream.cancelled.set()
+                            await asyncio.to_thread(ngspice.halt)
+                            yield _line({"type": "error", "detail": "timeout"})
+                            return
+                        await asyncio.sleep(settings.STREAM_POLL_SECONDS)
+                        continue
+                    # background thread is done: hand out the tail and stop
+                    stream.flush()
+                    if stream.blocks.empty():
+                        break
+                    continue
+                yield _line(block)
+
+            if ngspice.last_plot == "const":
+                yield _line({"type": "error", "detail": "Simulation failed"})
+            else:
+                yield _line({"type": "end", "points": stream.points, "plan": plan})
+        except Exception as e:
+            yield _line({"type": "error", "detail": str(e) or "Simulation failed"})
+        finally:
+            stream.cancelled.set()
+            if ngspice is not None:
+                ngspice.sink = None
+                if ngspice.is_running:
+                    ngspice.halt()
@@ -0,0 +1,176 @@
+import numpy as np
+import PySpice.Unit as Unit
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from config import settings
+from services.circuit_builder import flatten, si_value
+from utils.union_find import DisjointSet
+
+# Transient planning: turns the requested (step_time, end_time) into the settings
+# ngspice actually runs with, so a tiny step over a long window cannot ask for
+# billions of points.
+#
+# - output step: the requested step, widened until end_time / step fits in
+#   TRANSIENT_MAX_POINTS. ngspice interpolates its results onto this grid
+#   (.options interp), so the output size is fixed whatever the internal steps are.
+# - max internal step: the fastest dynamics divided by TRANSIENT_STEPS_PER_TAU,
+#   never above the output step and never below end_time / TRANSIENT_MAX_INTERNAL_STEPS.
+#   The fastest dynamics are the smallest first-order time constant, R*C or L/R with
+#   R the Thevenin resistance seen by the element, and the pulse source timings
+#   (pulse width, time between pulses). Subcircuits are flattened first so their
+#   elements count too.
+# - reltol / method: ngspice tolerance and integration method, validated here.
+
+METHODS = {"trap", "gear"}
+RELTOL_RANGE = (1e-6, 0.1)
+# conductance from every node to ground, keeps isolated nodes solvable (SPICE gmin)
+GMIN = 1e-12
+# Thevenin resistances above this mean "no resistive path", no time constant is derived
+R_OPEN = 1e9
+
+
+def _thevenin(components, shorts, ports):
+    # Resistance seen between each (node_a, node_b) in ports: resistors in place,
+    # elements whose type is in `shorts` replaced by wires, everything else open.
+    nets = DisjointSet()
+    nets.add("0")
+    for comp in components:
+        nets.find(comp.node1)
+        nets.find(comp.node2)
+        if comp.type in shorts:
+            nets.union(comp.node1, comp.node2)
+
+    ground = nets.find("0")
+    index = {}
+    for key in nets.parent:
+        root = nets.find(key)
+        if root != ground:
+            index.setdefault(root, len(index))
+    if not index:
+        return [0.0] * len(ports)
+
+    rows, cols, vals = [], [], []
+    for comp in components:
+        if comp.type != "R":
+            continue
+        value = si_value(comp.value, comp.prefix)
+        if value <= 0:
+            continue
+        g = 1.0 / value
+        a, b = index.get(nets.find(comp.node1), -1), index.get(nets.find(comp.node2), -1)
+        for i, j, v in ((a, a, g), (b, b, g), (a, b, -g), (b, a, -g)):
+            if i >= 0 and j >= 0:
+                rows.append(i)
+                cols.append(j)
+                vals.append(v)
+    n = len(index)
+    rows.extend(range(n))
+    cols.extend(range(n))
+    vals.extend([GMIN] * n)
+    lu = spla.splu(sp.csc_matrix((vals, (rows, cols)), shape=(n, n)))
+
+    resistances = []
+    for node_a, node_b in ports:
+        a, b = index.get(nets.find(node_a), -1), index.get(nets.find(node_b), -1)
+        if a == b:
+            resistances.append(0.0)
+            continue
+        rhs = np.zeros(n)
+        if a >= 0:
+            rhs[a] = 1.0
+        if b >= 0:
+            rhs[b] = -1.0
+        x = lu.solve(rhs)
+        resistances.append(float((x[a] if a >= 0 else 0.0) - (x[b] if b >= 0 else 0.0)))
+    return resistances
+
+
+def time_constants(components):
+    # First-order time constants of every capacitor (R*C, sources and inductors as
+    # shorts) and inductor (L/R, sources as shorts, capacitors and inductors open);
+    # E outputs are voltage sources
+    taus = []
+    capacitors = [comp for comp in components if comp.type == "C"]
+    if capacitors:
+        ports = [(comp.node1, comp.node2) for comp in capacitors]
+        for comp, r in zip(capacitors, _thevenin(components, {"V", "PV", "E", "L"}, ports)):
+            if 0 < r < R_OPEN:
+                taus.append(r * si_value(comp.value, comp.prefix))
+    inductors = [comp for comp in components if comp.type == "L"]
+    if inductors:
+        ports = [(comp.node1, comp.node2) for comp in inductors]
+        for comp, r in zip(inductors, _thevenin(components, {"V", "PV", "E"}, ports)):
+            if 0 < r < R_OPEN:
+                taus.append(si_value(comp.value, comp.prefix) / r)
+    return taus
+
+
+def pulse_times(components):
+    times = []
+    for comp in components:
+        if comp.type != "PV":
+            continue
+        width, period = comp.pulse_width, comp.period
+        if width and width > 0:
+            times.append(width)
+            if period and period > width:
+                times.append(period - width)
+    return times
+
+
+def plan_transient(components, step_time, end_time, reltol=None, method=None):
+    if not end_time or end_time <= 0:
+        raise ValueError("end_time must be positive")
+    if not step_time or step_time <= 0:
+        raise ValueError("step_time must be positive")
+    method = method or settings.TRANSIENT_METHOD
+    if method not in METHODS:
+        raise ValueError(f"Unsupported integration method: {method}")
+    reltol = settings.TRANSIENT_RELTOL if reltol is None else float(reltol)
+    if not RELTOL_RANGE[0] <= reltol <= RELTOL_RANGE[1]:
+        raise ValueError(f"reltol must be between {RELTOL_RANGE[0]:g} and {RELTOL_RANGE[1]:g}")
+
+    components = flatten(components)
+    output_step = max(step_time, end_time / max(settings.TRANSIENT_MAX_POINTS - 1, 1))
+    features = [t for t in time_constants(components) + pulse_times(components) if t > 0]
+    fastest = min(features) if features else None
+    max_step = output_step
+    if fastest is not None:
+        max_step = min(max_step, fastest / settings.TRANSIENT_STEPS_PER_TAU)
+    max_step = max(max_step, end_time / settings.TRANSIENT_MAX_INTERNAL_STEPS)
+
+    return {
+        "step_time": output_step,
+        "end_time": end_time,
+        "max_step": max_step,
+        "requested_step_time": step_time,
+        "step_limited": output_step > step_time,
+        "fastest_time_constant": fastest,
+        "reltol": reltol,
+        "method": method,
+        "points": int(np.floor(end_time / output_step + 1e-9)) + 1,
+    }
+
+
+def apply_plan(simulation, plan):
+    # simulation: a PySpice simulator (returns the analysis) or a deck that is only rendered
+    simulation.options("interp", reltol=plan["reltol"], method=plan["method"])
+    return simulation.transient(
+        step_time=plan["step_time"] @ Unit.u_s,
+        end_time=plan["end_time"] @ Unit.u_s,
+        max_time=plan["max_step"] @ Unit.u_s,
+    )
+
+
+def plan_headers(plan):
+    # response headers reporting the effective settings (empty for results stored before planning)
+    if not plan:
+        return {}
+    return {
+        "X-Output-Step": f"{plan['step_time']:g}",
+        "X-Max-Step": f"{plan['max_step']:g}",
+        "X-Transient-Reltol": f"{plan['reltol']:g}",
+        "X-Transient-Method": plan["method"],
+        "X-Step-Limited": "true" if plan["step_limited"] else "false",
+    }
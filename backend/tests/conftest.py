@@ -0,0 +1,32 @@
+import os
+
+# tests run without MongoDB: the persisted result store stays off
+os.environ.setdefault("RESULT_STORE_ENABLED", "0")
+
+
+def component(comp_id, comp_type, pins, value=None):
+    return {"id": comp_id, "type": comp_type, "x": 0, "y": 0, "rotation": 0, "value": value, "title": comp_id,
+            "connections": {pin: [] for pin in pins}}
+
+
+def wire(a, a_pin, b, b_pin, wire_id=None):
+    return {"id": wire_id or f"{a}.{a_pin}-{b}.{b_pin}", "from": {"componentId": a, "pinId": a_pin},
+            "to": {"componentId": b, "pinId": b_pin}, "points": [], "color": "black"}
+
+
+def divider():
+    # 5 V source over two 1 kOhm resistors
+    return {
+        "components": [
+            component("g", "ground", ["top"]),
+            component("v", "voltageSource", ["top", "bottom"], 5),
+            component("r1", "resistor", ["left", "right"], 1000),
+            component("r2", "resistor", ["left", "right"], 1000),
+        ],
+        "wires": [
+            wire("v", "bottom", "g", "top"),
+            wire("v", "top", "r1", "left"),
+            wire("r1", "right", "r2", "left"),
+            wire("r2", "right", "g", "top"),
+        ],
+    }
@@ -0,0 +1,21 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def test_unhashable_circuit_ids_fail_only_their_item():
+    response = client.post("/simulate/batch", json={"items": [
+        {"id": "list", "circuit_id": ["a", "b"]},
+        {"id": "dict", "circuit_id": {"$ne": None}},
+        {"id": "missing"},
+    ]})
+    assert response.status_code == 200
+    items = {line["id"]: line for line in map(json.loads, response.text.splitlines()) if line["type"] == "item"}
+    assert items["list"]["status"] == "error"
+    assert items["list"]["detail"] == "circuit_id must be a string"
+    assert items["dict"]["detail"] == "circuit_id must be a string"
+    assert items["missing"]["status"] == "error"
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from conftest import divider
+from main import app
+from routers.auth import get_current_user
+import routers.simulate as simulate
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+USER_ID = str(ObjectId())
+# what /simulate/load returned before results and fingerprints were stored with circuits
+LOAD_KEYS = {"id", "name", "description", "components", "wires", "revision"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = mongomock_motor.AsyncMongoMockClient().FEMspice
+    monkeypatch.setattr(simulate, "simulations_collection", db["simulations"])
+    monkeypatch.setattr(simulate, "users_collection", db["users"])
+    app.dependency_overrides[get_current_user] = lambda: {"id": USER_ID, "username": "tester"}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def saved_form(circuit):
+    return {"name": "divider", "description": "test",
+            "components": circuit["components"],
+            "wires": [{**{k: v for k, v in wire.items() if k != "from"}, "from_": wire["from"]} for wire in circuit["wires"]]}
+
+
+def test_load_returns_only_the_circuit(client):
+    saved = client.post("/simulate/save", json=saved_form(divider()))
+    assert saved.status_code == 201
+
+    loaded = client.get(f"/simulate/load/{saved.json()['circuit_id']}")
+    assert loaded.status_code == 200
+    assert set(loaded.json()) == LOAD_KEYS
+    # the fingerprint is stored, just not handed out
+    stored = asyncio.run(simulate.simulations_collection.find_one({"_id": ObjectId(saved.json()["circuit_id"])}))
+    assert "fingerprint" in stored
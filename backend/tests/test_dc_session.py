@@ -0,0 +1,43 @@
+import pytest
+
+from config import settings
+from model.circuit import SimComponent
+from services.dc_session import DCSession
+
+
+def divider():
+    return [
+        SimComponent(type="V", name="V1", node1="N1", node2="0", value=5, unit="volt", prefix=""),
+        SimComponent(type="R", name="R1", node1="N1", node2="N2", value=1000, unit="ohm", prefix=""),
+        SimComponent(type="R", name="R2", node1="N2", node2="0", value=1000, unit="ohm", prefix=""),
+    ]
+
+
+def state(session):
+    return [(comp.value, comp.prefix) for comp in session.components], session.result, session.mode
+
+
+def test_invalid_batch_changes_nothing():
+    session = DCSession(divider())
+    before = state(session)
+    with pytest.raises(ValueError):
+        session.apply({"R1": (5, ""), "R2": (-1, "")})
+    assert state(session) == before
+
+
+def test_rejected_refactorizing_edit_leaves_session_unchanged(monkeypatch):
+    # every edited resistor is over the low-rank limit: the edit goes straight to a refactorization
+    monkeypatch.setattr(settings, "DC_SESSION_MAX_UPDATES", 0)
+    session = DCSession(divider())
+    before = state(session)
+    values = session.system.values.copy()
+    with pytest.raises(ValueError):
+        # a conductance that overflows: the edited system has no finite solution
+        session.apply({"R1": (1e-320, "")})
+    assert state(session) == before
+    assert (session.system.values == values).all()
+    assert not session.columns
+
+    # and the session still works
+    assert session.apply({"R1": (3000, "")}) in ("low_rank", "refactorized")
+    assert session.result["node_voltages"]["n2"] == pytest.approx(1.25)
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import pytest
+
+import utils.metrics as metrics
+from services.executor import SimulationExecutor, JobTimeoutError
+
+
+def wait_until(condition, seconds=10):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_timeout_only_fails_the_overrunning_job():
+    executor = SimulationExecutor(max_workers=2, max_queue=4, timeout=60)
+    recycled = metrics.counters.get("executor.recycled", 0)
+
+    async def run():
+        # start both workers before timing anything
+        await asyncio.gather(executor.run(time.sleep, 0.2), executor.run(time.sleep, 0.2))
+        old_pool = executor._pool
+        workers = list(old_pool._processes.values())
+        stuck = asyncio.ensure_future(executor.run(time.sleep, 30, timeout=1))
+        neighbour = asyncio.ensure_future(executor.run(time.sleep, 3, timeout=20))
+        with pytest.raises(JobTimeoutError):
+            await stuck
+        # new jobs go to a fresh pool while the old one still finishes its other job
+        assert await executor.run(time.sleep, 0) is None
+        assert executor._pool is not old_pool
+        assert await neighbour is None
+        return workers
+
+    try:
+        workers = asyncio.run(run())
+        assert metrics.counters["executor.recycled"] == recycled + 1
+        # once its last job is done the retired pool's workers are killed
+        assert wait_until(lambda: not any(process.is_alive() for process in workers))
+    finally:
+        executor.shutdown()
@@ -0,0 +1,30 @@
+import asyncio
+import json
+
+from conftest import divider
+from services.executor import simulation_executor
+from services.jobs import JobQueue, MemoryJobStore
+
+
+def test_dc_job_runs_to_done():
+    queue = JobQueue(MemoryJobStore(), concurrency=1, user_concurrency=1)
+
+    async def run():
+        queue.start()
+        try:
+            job = await queue.submit("user", "dc", divider(), priority=0)
+            for _ in range(600):
+                stored = await queue.store.get(job["_id"])
+                if stored["status"] not in ("queued", "running"):
+                    return stored
+                await asyncio.sleep(0.1)
+        finally:
+            await queue.stop()
+
+    try:
+        job = asyncio.run(run())
+    finally:
+        simulation_executor.shutdown()
+    assert job["status"] == "done", job["error"]
+    assert "progress" not in job
+    assert json.loads(bytes(job["result"]))["result"]["node_voltages"]["n2"] == 2.5
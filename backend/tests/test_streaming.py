@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+from config import settings
+import services.streaming as streaming
+
+
+def collect(deck="deck"):
+    async def run():
+        return [json.loads(line) async for line in streaming.stream_transient(deck, {})]
+    return asyncio.run(run())
+
+
+def test_library_failure_ends_with_an_error_line(monkeypatch):
+    def missing():
+        raise OSError("cannot load library 'libngspice.so'")
+    monkeypatch.setattr(streaming, "get_streaming_ngspice", missing)
+    assert collect() == [{"type": "error", "detail": "cannot load library 'libngspice.so'"}]
+
+
+def test_rejected_deck_ends_with_an_error_line(monkeypatch):
+    def reject(ngspice, deck):
+        raise ValueError("bad deck")
+    monkeypatch.setattr(streaming, "get_streaming_ngspice", lambda: StuckNgSpice())
+    monkeypatch.setattr(streaming, "_start", reject)
+    assert collect() == [{"type": "error", "detail": "bad deck"}]
+
+
+class StuckNgSpice:
+    # a run that never finishes on its own
+    def __init__(self):
+        self.is_running = True
+        self.sink = None
+        self.halted = False
+
+    def halt(self):
+        self.halted = True
+        self.is_running = False
+
+
+def test_stuck_run_is_halted_after_the_time_limit(monkeypatch):
+    ngspice = StuckNgSpice()
+    monkeypatch.setattr(settings, "SIM_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(streaming, "get_streaming_ngspice", lambda: ngspice)
+    monkeypatch.setattr(streaming, "_start", lambda ngspice, deck: None)
+    assert collect() == [{"type": "error", "detail": "timeout"}]
+    assert ngspice.halted and not streaming._stream_lock.locked()
@@ -0,0 +1,38 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from config import settings
+from conftest import divider
+from main import app
+
+client = TestClient(app)
+
+
+def test_huge_point_count_is_rejected_before_allocating():
+    start = time.perf_counter()
+    response = client.post("/simulate/sweep", json={
+        **divider(), "sweep": {"component": "r2", "start": 1, "stop": 10, "points": 10 ** 13},
+    })
+    assert response.status_code == 400
+    assert str(settings.SWEEP_MAX_POINTS) in response.json()["detail"]
+    assert time.perf_counter() - start < 1
+
+
+def test_point_count_must_be_positive():
+    response = client.post("/simulate/sweep", json={
+        **divider(), "sweep": {"component": "r2", "start": 1, "stop": 10, "points": 0},
+    })
+    assert response.status_code == 400
+
+
+def test_too_many_values_are_rejected():
+    response = client.post("/simulate/sweep", json={
+        **divider(), "sweep": {"component": "r2", "values": [1.0] * (settings.SWEEP_MAX_POINTS + 1)},
+    })
+    assert response.status_code == 400
+
+
+def test_non_numeric_values_are_rejected():
+    response = client.post("/simulate/sweep", json={**divider(), "sweep": {"component": "r2", "values": [1, "a"]}})
+    assert response.status_code == 400
@@ -0,0 +1,154 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Compact storage encoding for saved circuits (see /simulate/save and /simulate/load).
+#
+#   version    uint8
+#   body       zlib stream of
+#     counts      7 x uint32   strings, string bytes, components, pin keys, pin wires, wires, points
+#     lengths     uint32[strings]            byte length of every table string
+#     strings     utf-8 bytes                the string table, concatenated
+#     components  COMPONENT_DTYPE[components]
+#     pins        PIN_DTYPE[pin keys]        one row per connections key, in component order
+#     pin wires   uint32[pin wires]          connections values, as string indices
+#     wires       WIRE_DTYPE[wires]
+#     points      float64[points]            every wire polyline, concatenated
+#
+# Every string (ids, types, titles, pin ids, colors) is stored once in the table and
+# referenced by index. decode_circuit() returns exactly the components/wires that
+# CircuitCreate.model_dump() produced, including the `from_` wire key the frontend reads.
+
+VERSION = 1
+_COUNTS = struct.Struct("<7I")
+
+COMPONENT_DTYPE = np.dtype([
+    ("id", "<u4"), ("type", "<u4"), ("title", "<u4"),
+    ("x", "<f8"), ("y", "<f8"), ("rotation", "<f8"), ("value", "<f8"),  # value: NaN when None
+    ("pins", "<u4"),
+])
+PIN_DTYPE = np.dtype([("key", "<u4"), ("wires", "<u4")])
+WIRE_DTYPE = np.dtype([
+    ("id", "<u4"), ("from_component", "<u4"), ("from_pin", "<u4"),
+    ("to_component", "<u4"), ("to_pin", "<u4"), ("color", "<u4"), ("points", "<u4"),
+])
+
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+
+    def __call__(self, value):
+        return self.index.setdefault(value, len(self.index))
+
+
+def encode_circuit(components, wires) -> bytes:
+    strings = _StringTable()
+
+    comp_rows = np.zeros(len(components), dtype=COMPONENT_DTYPE)
+    pin_rows = []
+    pin_wires = []
+    for row, comp in zip(comp_rows, components):
+        row["id"] = strings(comp["id"])
+        row["type"] = strings(comp["type"])
+        row["title"] = strings(comp["title"])
+        row["x"] = comp["x"]
+        row["y"] = comp["y"]
+        row["rotation"] = comp["rotation"]
+        row["value"] = np.nan if comp["value"] is None else comp["value"]
+        row["pins"] = len(comp["connections"])
+        for key, wire_ids in comp["connections"].items():
+            pin_rows.append((strings(key), len(wire_ids)))
+            pin_wires.extend(map(strings, wire_ids))
+
+    wire_rows = np.zeros(len(wires), dtype=WIRE_DTYPE)
+    points = []
+    for row, wire in zip(wire_rows, wires):
+        row["id"] = strings(wire["id"])
+        row["from_component"] = strings(wire["from_"]["componentId"])
+        row["from_pin"] = strings(wire["from_"]["pinId"])
+        row["to_component"] = strings(wire["to"]["componentId"])
+        row["to_pin"] = strings(wire["to"]["pinId"])
+        row["color"] = strings(wire["color"])
+        row["points"] = len(wire["points"])
+        points.extend(wire["points"])
+
+    encoded = [s.encode("utf-8") for s in strings.index]
+    pin_rows = np.array(pin_rows, dtype=PIN_DTYPE)
+    pin_wires = np.array(pin_wires, dtype="<u4")
+    points = np.array(points, dtype="<f8")
+    blob = b"".join(encoded)
+    body = b"".join((
+        _COUNTS.pack(len(encoded), len(blob), len(comp_rows), len(pin_rows), len(pin_wires), len(wire_rows), len(points)),
+        np.array([len(s) for s in encoded], dtype="<u4").tobytes(),
+        blob,
+        comp_rows.tobytes(),
+        pin_rows.tobytes(),
+        pin_wires.tobytes(),
+        wire_rows.tobytes(),
+        points.tobytes(),
+    ))
+    return bytes([VERSION]) + zlib.compress(body)
+
+
+def decode_circuit(payload: bytes):
+    payload = bytes(payload)
+    if not payload or payload[0] != VERSION:
+        raise ValueError("Unsupported circuit encoding")
+    body = zlib.decompress(payload[1:])
+    n_strings, n_bytes, n_components, n_pins, n_pin_wires, n_wires, n_points = _COUNTS.unpack_from(body)
+    offset = _COUNTS.size
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += array.nbytes
+        return array
+
+    # lengths are utf-8 byte counts, so the table is split before decoding
+    ends = np.cumsum(take("<u4", n_strings), dtype=np.int64).tolist()
+    blob = body[offset:offset + n_bytes]
+    offset += n_bytes
+    strings = [blob[start:end].decode("utf-8") for start, end in zip([0] + ends[:-1], ends)]
+
+    comp_rows = take(COMPONENT_DTYPE, n_components)
+    pin_rows = take(PIN_DTYPE, n_pins)
+    pin_wires = take("<u4", n_pin_wires).tolist()
+    wire_rows = take(WIRE_DTYPE, n_wires)
+    points = take("<f8", n_points).tolist()
+
+    components = []
+    pin_keys = pin_rows["key"].tolist()
+    pin_counts = pin_rows["wires"].tolist()
+    pin, pin_wire = 0, 0
+    for comp_id, comp_type, title, x, y, rotation, value, n_comp_pins in comp_rows.tolist():
+        connections = {}
+        for key, count in zip(pin_keys[pin:pin + n_comp_pins], pin_counts[pin:pin + n_comp_pins]):
+            connections[strings[key]] = [strings[i] for i in pin_wires[pin_wire:pin_wire + count]]
+            pin_wire += count
+        pin += n_comp_pins
+        components.append({
+            "id": strings[comp_id],
+            "type": strings[comp_type],
+            "x": x,
+            "y": y,
+            "rotation": rotation,
+            "value": None if value != value else value,
+            "title": strings[title],
+            "connections": connections,
+        })
+
+    wires = []
+    point = 0
+    for wire_id, from_component, from_pin, to_component, to_pin, color, n_wire_points in wire_rows.tolist():
+        wires.append({
+            "id": strings[wire_id],
+            "from_": {"componentId": strings[from_component], "pinId": strings[from_pin]},
+            "to": {"componentId": strings[to_component], "pinId": strings[to_pin]},
+            "points": points[point:point + n_wire_points],
+            "color": strings[color],
+        })
+        point += n_wire_points
+
+    return components, wires
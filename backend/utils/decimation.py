@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def minmax_decimate(time, series: dict, max_points: int):
+    # Reduce a shared-time-axis waveform set to at most `max_points` samples.
+    #
+    # The samples are split into equal buckets and, for every node, the sample with
+    # the minimum and the one with the maximum value in each bucket are kept (plus the
+    # first and last sample). Because the kept indices are shared between nodes, all
+    # vectors still use one time axis. Peaks survive by construction, and a pulse edge
+    # falling inside a bucket keeps both its low and high level at their real times.
+    time = np.asarray(time)
+    n = time.shape[0]
+    if max_points is None or n <= max_points or not series:
+        return time, series
+
+    values = np.vstack([np.asarray(v) for v in series.values()])
+    n_series = values.shape[0]
+    # the budget is shared by all nodes: each bucket can keep 2 samples per node
+    n_buckets = (max_points - 2) // (2 * n_series)
+    if n_buckets < 1:
+        # too many nodes for even one min/max pair each: keep evenly spaced samples instead
+        indices = np.unique(np.linspace(0, n - 1, max(2, max_points)).round().astype(np.intp))
+        return time[indices], {name: np.asarray(v)[indices] for name, v in series.items()}
+    bucket_size = -(-n // n_buckets)
+
+    # pad with the last sample so every bucket has the same length, then work on a 3D view
+    pad = n_buckets * bucket_size - n
+    if pad:
+        values = np.pad(values, ((0, 0), (0, pad)), mode="edge")
+    buckets = values.reshape(n_series, n_buckets, bucket_size)
+
+    offsets = np.arange(n_buckets) * bucket_size
+    picked = np.concatenate((
+        (buckets.argmin(axis=2) + offsets).ravel(),
+        (buckets.argmax(axis=2) + offsets).ravel(),
+        [0, n - 1],
+    ))
+    indices = np.unique(np.minimum(picked, n - 1))
+
+    return time[indices], {name: np.asarray(v)[indices] for name, v in series.items()}
@@ -0,0 +1,47 @@
+import hashlib
+import json
+
+# Fields that only describe how the schematic is drawn; they never reach the netlist.
+LAYOUT_FIELDS = {"x", "y", "position", "rotation", "title", "color", "points"}
+
+
+def _canonical_component(comp):
+    canonical = {k: v for k, v in comp.items() if k not in LAYOUT_FIELDS and k != "connections"}
+    # pin order matters (first two pins become node1/node2), wire ids attached to pins do not
+    canonical["pins"] = list(comp.get("connections", {}).keys())
+    return canonical
+
+
+def _canonical_wire(wire):
+    a = (wire["from"]["componentId"], wire["from"]["pinId"])
+    b = (wire["to"]["componentId"], wire["to"]["pinId"])
+    return sorted([a, b])
+
+
+def _canonical_circuit(circuit):
+    components = sorted(
+        (_canonical_component(comp) for comp in circuit.get("components", [])),
+        key=lambda comp: str(comp.get("id")),
+    )
+    wires = sorted(_canonical_wire(wire) for wire in circuit.get("wires", []))
+    return {"components": components, "wires": wires}
+
+
+def circuit_fingerprint(frontend_data) -> str:
+    # Hash of everything that can change the translated netlist: component types,
+    # values, prefixes, source/pulse parameters, wire connectivity and subcircuit definitions.
+    # Layout fields (x/y/rotation/title, wire ids, points, colors) are ignored.
+    canonical = _canonical_circuit(frontend_data)
+    subcircuits = frontend_data.get("subcircuits")
+    if subcircuits:
+        # only present when used, so fingerprints of plain circuits stay the same
+        canonical["subcircuits"] = {
+            name: {**_canonical_circuit(spec), "ports": spec.get("ports")} for name, spec in subcircuits.items()
+        }
+    payload = json.dumps(
+        canonical,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,45 @@
+import threading
+
+# Very small in-process metrics registry, exposed on GET /metrics.
+# Counters are plain integers, timings keep count/total/max/last of observed values
+# (seconds) and sources are callables returning a dict that is evaluated when a
+# snapshot is taken (used by caches, pools, ...).
+
+_lock = threading.Lock()
+counters = {}
+timings = {}
+_sources = {}
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        entry = timings.get(name)
+        if entry is None:
+            entry = timings[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+        entry["last"] = seconds
+
+
+def register_source(name: str, source):
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    with _lock:
+        result = {
+            "counters": dict(counters),
+            "timings": {
+                name: {**entry, "mean": entry["total"] / entry["count"]}
+                for name, entry in timings.items()
+            },
+        }
+    for name, source in _sources.items():
+        result[name] = source()
+    return result
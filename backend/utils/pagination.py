@@ -0,0 +1,33 @@
+import base64
+import datetime
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Opaque continuation tokens for keyset pagination on (created_at, _id), newest first.
+# The token carries the sort key of the last returned document; the next page is
+# everything strictly after it, which stays correct while documents are inserted or
+# deleted and costs one index seek regardless of how deep the page is.
+
+
+def encode_cursor(created_at: datetime.datetime, doc_id: ObjectId) -> str:
+    payload = json.dumps({"t": created_at.isoformat(), "id": str(doc_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+
+def after_cursor(token: str) -> dict:
+    # Mongo filter for documents that sort after the cursor in (created_at desc, _id desc)
+    created_at, doc_id = decode_cursor(token)
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": doc_id}},
+    ]}
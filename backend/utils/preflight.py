@@ -0,0 +1,122 @@
+import utils.metrics as metrics
+from utils.union_find import DisjointSet
+
+# Preflight topology checks, run on the translated components before any simulator.
+#
+# ngspice needs a non-singular operating point, so these circuits are rejected here:
+# - unconnected_pin: a component pin that is not wired to anything;
+# - floating_net: nets with no DC path to ground (only capacitors, or nothing, lead
+#   away from them), their voltage is undefined;
+# - current_source_cutset: nets a current source drives whose only other way out is
+#   through current sources / capacitors, KCL cannot hold;
+# - voltage_loop: a loop made only of voltage sources and inductors (DC shorts),
+#   the loop current is undefined (or the sources contradict each other).
+# Controlled sources count as the source on their output pins. Subcircuit definitions
+# are checked on their own with their ports as the reference, an instance is assumed
+# to connect its ports.
+# Two disjoint-set passes over the components, near-linear in the circuit size.
+
+# elements that conduct at DC / that fix the voltage across them at DC
+DC_PATH = {"R", "L", "V", "PV"}
+VOLTAGE_DEFINED = {"L", "V", "PV"}
+# at most this many diagnostics are spelled out in the error message
+MESSAGE_DIAGNOSTICS = 3
+
+
+class InvalidCircuit(ValueError):
+
+    def __init__(self, diagnostics):
+        self.diagnostics = diagnostics
+        shown = "; ".join(d["message"] for d in diagnostics[:MESSAGE_DIAGNOSTICS])
+        more = len(diagnostics) - MESSAGE_DIAGNOSTICS
+        if more > 0:
+            shown += f" (and {more} more)"
+        super().__init__(f"Circuit cannot be simulated: {shown}")
+
+
+def _diagnostic(code, comp, frontend_ids, nets, message, scope=None):
+    diagnostic = {"code": code, "component": frontend_ids.get(comp.name), "name": comp.name,
+                  "nets": nets, "message": message}
+    if scope is not None:
+        diagnostic["subcircuit"] = scope
+        diagnostic["message"] = f"in subcircuit {scope}: {message}"
+    return diagnostic
+
+
+def _branches(comp):
+    # (kind, node_a, node_b) as seen at DC; multi-pin elements map onto the two-pin kinds
+    nodes = comp.terminals
+    if comp.type == "E":
+        return [("V", nodes[0], nodes[1])]   # control pins draw no current
+    if comp.type == "G":
+        return [("I", nodes[0], nodes[1])]
+    if comp.type == "X":
+        # the definition is checked on its own, its ports are assumed connected
+        return [("R", nodes[0], node) for node in nodes[1:]]
+    return [(comp.type, comp.node1, comp.node2)]
+
+
+def check_topology(components, components_mapping, anchored=(), scope=None):
+    # -> list of diagnostics (empty when the circuit can be simulated)
+    # components_mapping: frontend component id -> element name, as returned by the translation
+    # anchored: nodes with a DC path to ground outside these components (subcircuit ports)
+    frontend_ids = {name: comp_id for comp_id, name in components_mapping.items()}
+    diagnostics = []
+    connected = []
+    for comp in components:
+        if any(node is None for node in comp.terminals):
+            diagnostics.append(_diagnostic("unconnected_pin", comp, frontend_ids,
+                                           [node for node in comp.terminals if node is not None],
+                                           f"{comp.name} has an unconnected pin", scope))
+        else:
+            connected.append((comp, _branches(comp)))
+
+    dc_nets = DisjointSet()
+    dc_nets.add("0")
+    for node in anchored:
+        dc_nets.union("0", node)
+    loops = DisjointSet()
+    for comp, branches in connected:
+        for node in comp.terminals:
+            dc_nets.find(node)
+        for kind, a, b in branches:
+            if kind in DC_PATH:
+                dc_nets.union(a, b)
+            if kind in VOLTAGE_DEFINED:
+                if loops.find(a) == loops.find(b):
+                    diagnostics.append(_diagnostic("voltage_loop", comp, frontend_ids, [a, b],
+                                                   f"{comp.name} closes a loop of voltage sources and inductors", scope))
+                else:
+                    loops.union(a, b)
+
+    ground = dc_nets.find("0")
+    # floating groups driven by a current source from outside are cutsets, the others just float
+    driven = set()
+    for comp, branches in connected:
+        for kind, a, b in branches:
+            root_a, root_b = dc_nets.find(a), dc_nets.find(b)
+            if kind == "I" and root_a != root_b:
+                driven.update(root for root in (root_a, root_b) if root != ground)
+
+    for comp, branches in connected:
+        floating = [node for node in dict.fromkeys(comp.terminals) if dc_nets.find(node) != ground]
+        if not floating:
+            continue
+        drives = any(kind == "I" and dc_nets.find(a) != dc_nets.find(b) for kind, a, b in branches)
+        if drives and any(dc_nets.find(node) in driven for node in floating):
+            diagnostics.append(_diagnostic("current_source_cutset", comp, frontend_ids, floating,
+                                           f"{comp.name} drives {', '.join(floating)}, which has no other DC path to ground",
+                                           scope))
+        elif not any(dc_nets.find(node) in driven for node in floating):
+            diagnostics.append(_diagnostic("floating_net", comp, frontend_ids, floating,
+                                           f"{comp.name} is on {', '.join(floating)}, which has no DC path to ground", scope))
+    return diagnostics
+
+
+def preflight(components, components_mapping, anchored=(), scope=None):
+    diagnostics = check_topology(components, components_mapping, anchored, scope)
+    if diagnostics:
+        metrics.incr("preflight.rejected")
+        for code in {d["code"] for d in diagnostics}:
+            metrics.incr(f"preflight.{code}")
+        raise InvalidCircuit(diagnostics)
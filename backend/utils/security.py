@@ -1,9 +1,68 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+from config import settings
+import utils.metrics as metrics
+
+
+class CryptoBusyError(Exception):
+    pass
+
+
 def hash_password(plain_password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(plain_password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def needs_rehash(hashed_password: str) -> bool:
+    # "$2b$<cost>$<salt+hash>": rehash when the stored cost differs from BCRYPT_ROUNDS
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# bcrypt is deliberately slow and releases the GIL while it works, so it runs on a
+# small dedicated thread pool instead of the event loop. The semaphore is the
+# admission limit: at most AUTH_CRYPTO_MAX_PENDING operations are running or waiting,
+# anything beyond that waits up to AUTH_CRYPTO_QUEUE_TIMEOUT_SECONDS and is then
+# rejected with CryptoBusyError. Time spent waiting is reported as auth.crypto.queue.
+_pool = ThreadPoolExecutor(max_workers=settings.AUTH_CRYPTO_WORKERS, thread_name_prefix="auth-crypto")
+_admission = asyncio.Semaphore(settings.AUTH_CRYPTO_MAX_PENDING)
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter() - started
+
+
+async def _run(name, fn, *args):
+    queued = time.perf_counter()
+    try:
+        await asyncio.wait_for(_admission.acquire(), settings.AUTH_CRYPTO_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        metrics.incr("auth.crypto.rejected")
+        raise CryptoBusyError("Too many concurrent sign-ins, please try again shortly.")
+    try:
+        result, started, elapsed = await asyncio.get_running_loop().run_in_executor(_pool, _timed, fn, *args)
+    finally:
+        _admission.release()
+    # queue time covers both the admission wait and waiting for a free pool thread
+    metrics.observe("auth.crypto.queue", started - queued)
+    metrics.observe(f"auth.crypto.{name}", elapsed)
+    return result
+
+
+async def hash_password_async(plain_password: str) -> str:
+    return await _run("hash", hash_password, plain_password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run("verify", verify_password, plain_password, hashed_password)
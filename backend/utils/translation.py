@@ -1,38 +1,56 @@
-from model.circuit import SimComponent
+import re
+from model.circuit import SimComponent, SubcircuitDef
 from collections import defaultdict
-
-def convert_frontend_to_netlist(frontend_data):
-    # print("DATA")
-    # print(frontend_data)
-    # print("------------------------------------")
-    components = frontend_data["components"]
-    wires = frontend_data["wires"]
+from utils.union_find import DisjointSet
+from utils.preflight import preflight
+
+# translate frontend types → PySpice types
+TYPE_MAP = {
+    "resistor": "R",
+    "capacitor": "C",
+    "inductor": "L",
+    "voltageSource": "V",
+    "currentSource": "I",
+    "pulseVoltageSource": "PV",
+    "vcvs": "E",
+    "vccs": "G",
+    "subcircuit": "X",
+}
+UNIT_MAP = {"R": "ohm", "V": "volt", "C": "farad", "L": "henry", "I": "ampere", "PV": "volt",
+            "E": "none", "G": "siemens", "X": "none"}
+# pins of multi-pin elements, in SPICE node order (output +, output -, control +, control -)
+PIN_ORDER = {
+    "vcvs": ("top", "bottom", "controlTop", "controlBottom"),
+    "vccs": ("top", "bottom", "controlTop", "controlBottom"),
+}
+# subcircuit and port names are written to the netlist as they are
+SPICE_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+# generated net names (N1, ... and X1_<port>) and ngspice's ground alias, ports cannot use
+# them; SPICE node names are case-insensitive, so neither can n1 or x1_out
+AUTO_NET = re.compile(r"(N\d+|X\d+_.*|gnd)$", re.IGNORECASE)
+
+
+def name_nets(components, wires, ports=()):
+    # -> ({(componentId, pinId): net name}, ground found)
+    # ports: [(port name, (componentId, pinId))] of a subcircuit definition; the net of
+    # each port is named after it
 
     # Build a map of each pin to the net it connects to
-    pin_to_net = {}
-    nets = []
-    # next_net_id = 1
-
-    def find_or_create_net(pin):
-        for net in nets:
-            if pin in net:
-                return net
-        new_net = {pin}
-        nets.append(new_net)
-        return new_net
+    # (disjoint-set keyed by (componentId, pinId), near-linear in the number of wires)
+    nets = DisjointSet()
 
     # Step 1: connect all wires into electrical nets
     for wire in wires:
         pin_a = (wire["from"]["componentId"], wire["from"]["pinId"])
         pin_b = (wire["to"]["componentId"], wire["to"]["pinId"])
-        net_a = find_or_create_net(pin_a)
-        net_b = find_or_create_net(pin_b)
-
-        # merge nets if distinct
-        if net_a != net_b:
-            net_a |= net_b
-            nets.remove(net_b)
+        nets.union(pin_a, pin_b)
 
+    port_nets = {}
+    for port, pin in ports:
+        root = nets.find(pin)
+        if root in port_nets:
+            raise ValueError(f"Ports {port_nets[root]} and {port} are the same net")
+        port_nets[root] = port
 
     # Step 2: assign names to each net (N1, N2, ...)
     net_name_map = {}
@@ -42,24 +60,58 @@ def convert_frontend_to_netlist(frontend_data):
             for pin in comp["connections"].keys():
                 ground_nets.add((comp["id"], pin))
 
-    for i, net in enumerate(nets, start=1):
+    for i, (root, net) in enumerate(nets.groups().items(), start=1):
         # Default name
-        name = f"N{i}"
+        name = port_nets.get(root, f"N{i}")
         # If any pin in this net is ground, force name to "0"
         if any(pin in ground_nets for pin in net):
+            if root in port_nets:
+                raise ValueError(f"Port {port_nets[root]} is connected to ground")
             name = "0"
 
         # Map each pin to that name
         for pin in net:
             net_name_map[pin] = name
-    
-
-    if not ground_nets:
-        print("NO GROUND FOUND")
-        raise ValueError("No ground found in circuit — please add one before simulation.")
 
-    print(net_name_map)
-    
+    return net_name_map, bool(ground_nets)
+
+
+def subcircuit_definition(name, subcircuits, definitions, parents=()):
+    # SubcircuitDef of frontend_data["subcircuits"][name], translated once per request
+    # and shared by all its instances; parents: definitions being translated around it
+    if name in definitions:
+        return definitions[name]
+    if name in parents:
+        raise ValueError(f"Subcircuit {name} instantiates itself")
+    spec = (subcircuits or {}).get(name)
+    if spec is None:
+        raise ValueError(f"Unknown subcircuit: {name}")
+    if not SPICE_NAME.match(name):
+        raise ValueError(f"Invalid subcircuit name: {name}")
+
+    ports = [(port["name"], (port["componentId"], port["pinId"])) for port in spec["ports"]]
+    names = [port for port, _ in ports]
+    if not names:
+        raise ValueError(f"Subcircuit {name} has no ports")
+    for port in names:
+        if not SPICE_NAME.match(port) or AUTO_NET.match(port):
+            raise ValueError(f"Invalid port name in subcircuit {name}: {port}")
+    if len({port.lower() for port in names}) != len(names):
+        raise ValueError(f"Subcircuit {name} has duplicate ports")
+
+    net_name_map, _ = name_nets(spec["components"], spec["wires"], ports)
+    parsed_components, comp_mapping = parse_components(
+        spec["components"], net_name_map, subcircuits, definitions, (*parents, name)
+    )
+    # the ports are driven from outside: internal nets only need a DC path to one of them
+    preflight(parsed_components, comp_mapping, anchored=names, scope=name)
+
+    definition = SubcircuitDef(name=name, ports=names, components=parsed_components)
+    definitions[name] = definition
+    return definition
+
+
+def parse_components(components, net_name_map, subcircuits, definitions, parents=()):
     # Step 3: build simplified component list
     parsed_components = []
     type_counters = defaultdict(int)  # counts per type
@@ -67,75 +119,81 @@ def convert_frontend_to_netlist(frontend_data):
     for comp in components:
         pin_connections = comp["connections"]
         pins = list(pin_connections.keys())
+        comp_type = TYPE_MAP.get(comp["type"])
+        definition = None
+
+        if comp_type == "X":
+            # one node per port, in the order of the definition; a port without wires
+            # still is a node of its own (an output nothing is attached to)
+            definition = subcircuit_definition(comp.get("subcircuit"), subcircuits, definitions, parents)
+            instance = f"X{type_counters[comp_type] + 1}"
+            for port in definition.ports:
+                net_name_map.setdefault((comp["id"], port), f"{instance}_{port}")
+            nodes = [net_name_map[(comp["id"], port)] for port in definition.ports]
+        elif comp["type"] in PIN_ORDER:
+            nodes = [net_name_map.get((comp["id"], pin)) for pin in PIN_ORDER[comp["type"]]]
 
         # pick first two pins (for simplicity)
-        if len(pins) < 2:
+        elif len(pins) < 2:
             continue
 
-        if comp["type"] in ("voltageSource", "currentSource"):
+        elif comp["type"] in ("voltageSource", "currentSource"):
 
             # Force node1 = bottom/right (arrow tail)
             bottom_pin = "bottom"
             top_pin = "top"
-            node1 = net_name_map.get((comp["id"], top_pin))
-            node2 = net_name_map.get((comp["id"], bottom_pin))
-
+            nodes = [net_name_map.get((comp["id"], top_pin)), net_name_map.get((comp["id"], bottom_pin))]
 
         else:
-            node1 = net_name_map.get((comp["id"], pins[0]))
-            node2 = net_name_map.get((comp["id"], pins[1]))
-
-     
-
-        # translate frontend types → PySpice types
-
-        
-        type_map = {
-            "resistor": "R",
-            "capacitor": "C",
-            "inductor": "L",
-            "voltageSource": "V",
-            "currentSource": "I",
-            "pulseVoltageSource": "PV",
-        }
-        comp_type = type_map.get(comp["type"])
+            nodes = [net_name_map.get((comp["id"], pins[0])), net_name_map.get((comp["id"], pins[1]))]
+
         type_counters[comp_type] += 1
         comp_name = f"{comp_type}{type_counters[comp_type]}"
         comp_mapping[comp["id"]] = comp_name
 
-        # if comp_type == "I":
-
-        #     print("CURRENT SOURCE")
-        #     print(node1)
-        #     print((comp["id"], pins[0]))
-        #     print(node2)
-        #     print((comp["id"], pins[1]))
-        #     print()
-
-
         temp = SimComponent(
             type=comp_type,
             name=comp_name,
-            node1=node1,
-            node2=node2,
-            value=comp["value"],
-            unit="ohm" if comp_type == "R" else
-                 "volt" if comp_type == "V" else
-                 "farad" if comp_type == "C" else
-                 "henry" if comp_type == "L" else
-                 "ampere" if comp_type == "I" else "",
+            node1=nodes[0],
+            node2=nodes[1] if len(nodes) > 1 else nodes[0],
+            value=0.0 if comp_type == "X" else comp["value"],
+            unit=UNIT_MAP.get(comp_type, ""),
             prefix=""  # Default to no prefix; can be extended to parse from frontend
         )
-        # if comp_type == "I":
-        #   print(temp)
+        if len(nodes) != 2 or definition is not None:
+            temp.nodes = nodes
+            temp.subcircuit = definition
+        if comp_type in ("V", "I"):
+            temp.ac_magnitude = comp.get("acMagnitude")
+            temp.ac_phase = comp.get("acPhase")
         if comp_type == "PV":
             temp.initial_value = (comp.get("initialValue", 0), comp.get("initialPrefix", ""), "volt")
             temp.pulse_value = comp.get("pulse_value")
             temp.pulse_width = comp.get("pulse_width")
             temp.period = comp.get("period")
-            temp.unit = "volt"
         parsed_components.append(temp)
+    return parsed_components, comp_mapping
+
+
+def convert_frontend_to_netlist(frontend_data):
+    # frontend_data: components, wires and optionally "subcircuits":
+    #   {name: {"ports": [{"name", "componentId", "pinId"}], "components": [...], "wires": [...]}}
+    # instantiated by components {"type": "subcircuit", "subcircuit": name} whose pins are the port names
+    components = frontend_data["components"]
+    wires = frontend_data["wires"]
+    subcircuits = frontend_data.get("subcircuits")
+    if subcircuits and len({name.lower() for name in subcircuits}) != len(subcircuits):
+        raise ValueError("Subcircuit names must be unique (ignoring case)")
+
+    net_name_map, has_ground = name_nets(components, wires)
+    if not has_ground:
+        print("NO GROUND FOUND")
+        raise ValueError("No ground found in circuit — please add one before simulation.")
+
+    parsed_components, comp_mapping = parse_components(components, net_name_map, subcircuits, {})
+
+    # Step 4: reject circuits ngspice cannot solve (utils/preflight.py)
+    preflight(parsed_components, comp_mapping)
 
     json_safe_map = {f"{k[0]}:{k[1]}": v for k, v in net_name_map.items()}
     return {"components": parsed_components, "mappings": json_safe_map, 'components_mapping': comp_mapping}
-
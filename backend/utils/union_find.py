@@ -0,0 +1,64 @@
+class DisjointSet:
+    # Union-find over hashable keys with path compression and union by rank.
+    # Every root also carries a "slot": the creation order of the set it represents.
+    # When two sets merge the result keeps the slot of the first argument, which
+    # mirrors the old list-of-sets behaviour (net_a stays where it was, net_b is removed)
+    # so net numbering stays the same as before.
+
+    def __init__(self):
+        self.parent = {}
+        self.rank = {}
+        self.slot = {}
+        self._next_slot = 0
+
+    def __contains__(self, key):
+        return key in self.parent
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self, key):
+        if key not in self.parent:
+            self.parent[key] = key
+            self.rank[key] = 0
+            self.slot[key] = self._next_slot
+            self._next_slot += 1
+        return key
+
+    def find(self, key):
+        parent = self.parent
+        if key not in parent:
+            return self.add(key)
+
+        root = key
+        while parent[root] != root:
+            root = parent[root]
+
+        # path compression
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    def union(self, a, b):
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return root_a
+
+        slot = self.slot[root_a]
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+
+        self.slot[root_a] = slot
+        del self.slot[root_b]
+        return root_a
+
+    def groups(self):
+        # returns {root: [keys...]} ordered by slot
+        members = {}
+        for key in self.parent:
+            members.setdefault(self.find(key), []).append(key)
+        return dict(sorted(members.items(), key=lambda item: self.slot[item[0]]))
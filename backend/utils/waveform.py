@@ -0,0 +1,75 @@
+import json
+import struct
+
+import numpy as np
+
+# Binary waveform container returned by /simulate/transcient (format=binary).
+#
+#   magic      4 bytes   b"FEMW"
+#   version    uint16    little endian
+#   header_len uint32    length of the JSON header in bytes
+#   header     JSON      {"axis": "time", "dtype": "<f4", "points": N, "series": [...], "metadata": {...}}
+#   padding    zero bytes up to the next multiple of 8
+#   data       (1 + len(series)) * N values of `dtype`: the axis first, then every series in order
+#
+# The data block starts 8-byte aligned so a browser can wrap it directly in a
+# Float32Array / Float64Array without copying. Complex dtypes (AC results) store
+# every value as interleaved (real, imaginary) floats, the axis included.
+
+MAGIC = b"FEMW"
+VERSION = 1
+_PREFIX = struct.Struct("<4sHI")
+
+DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+    "complex64": np.dtype("<c8"),
+    "complex128": np.dtype("<c16"),
+}
+
+
+def pack_waveforms(axis_name: str, axis, series: dict, dtype: str = "float32", metadata: dict = None) -> bytes:
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+    np_dtype = DTYPES[dtype]
+
+    axis = np.asarray(axis)
+    data = np.empty((1 + len(series), axis.shape[0]), dtype=np_dtype)
+    data[0] = axis
+    for row, values in enumerate(series.values(), start=1):
+        data[row] = np.asarray(values)
+
+    header = json.dumps({
+        "axis": axis_name,
+        "dtype": np_dtype.str,
+        "points": int(axis.shape[0]),
+        "series": list(series.keys()),
+        "metadata": metadata or {},
+    }, separators=(",", ":")).encode("utf-8")
+    padding = -(_PREFIX.size + len(header)) % 8
+
+    return b"".join((
+        _PREFIX.pack(MAGIC, VERSION, len(header)),
+        header,
+        b"\0" * padding,
+        data.tobytes(),
+    ))
+
+
+def unpack_waveforms(buf: bytes):
+    magic, version, header_len = _PREFIX.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("Not a FEMspice waveform buffer")
+    if version != VERSION:
+        raise ValueError(f"Unsupported waveform version: {version}")
+
+    start = _PREFIX.size
+    header = json.loads(bytes(buf[start:start + header_len]))
+    offset = start + header_len
+    offset += -offset % 8
+
+    names = header["series"]
+    data = np.frombuffer(buf, dtype=np.dtype(header["dtype"]), offset=offset,
+                         count=(1 + len(names)) * header["points"])
+    data = data.reshape(1 + len(names), header["points"])
+    return header, data[0], dict(zip(names, data[1:]))
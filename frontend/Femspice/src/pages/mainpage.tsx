@@ -260,6 +260,8 @@ export default function MainPage() {
     setIsSaveDialogOpen(true);
   }, []);
   const hasLoadedRef = useRef(false);
+  // revision of the loaded circuit; DC runs are attached to it so reopening shows them
+  const loadedRevisionRef = useRef<number | null>(null);
   const [draft, setDraft] = useState<ComponentDraft>({
     title: "",
     value: "",
@@ -363,7 +365,7 @@ export default function MainPage() {
     hasLoadedRef.current = true;
     const fetchCircuit = async () => {
       try {
-        const response = await fetch(`http://127.0.0.1:8000/simulate/load/${circuitId}`, {
+        const response = await fetch(`http://127.0.0.1:8000/simulate/load/${circuitId}?results=true`, {
           method: "GET",
           headers: {
             Authorization: `Bearer ${localStorage.getItem("token")}`,
@@ -442,6 +444,11 @@ export default function MainPage() {
           };
         });
         setWires(normalizedWires);
+        loadedRevisionRef.current =
+          typeof data.revision === "number" ? data.revision : null;
+        if (data.results?.dc) {
+          applySimulationResult(data.results.dc as SimulationApiResponse);
+        }
       } catch (error) {
         console.error("Error loading circuit:", error);
       }
@@ -942,11 +949,21 @@ export default function MainPage() {
 
     setSimulationResult(null);
 
+    const circuitId = searchParams.get("id");
+    const token = localStorage.getItem("token");
+    const linkResult = Boolean(circuitId && token && loadedRevisionRef.current !== null);
+    const savedCircuit = linkResult
+      ? { circuit_id: circuitId, revision: loadedRevisionRef.current }
+      : {};
+
     try {
       const response = await fetch("http://127.0.0.1:8000/simulate/test", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        headers: {
+          "Content-Type": "application/json",
+          ...(linkResult ? { Authorization: `Bearer ${token}` } : {}),
+        },
+        body: JSON.stringify({ ...payload, ...savedCircuit }),
       });
       console.log("Simulation request payload:", payload);
 
@@ -1029,7 +1046,7 @@ export default function MainPage() {
     setSimulationResult(null);
 
     try {
-      const response = await fetch("http://127.0.0.1:8000/simulate/transcient", {
+      const response = await fetch("http://127.0.0.1:8000/simulate/transcient?format=png", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(payload),
@@ -1062,7 +1079,7 @@ export default function MainPage() {
     }
   }
 
-  }, [components, wires, circuitMode, applySimulationResult]);
+  }, [components, wires, circuitMode, applySimulationResult, searchParams]);
 
   const handleDraftChange = useCallback(
     (field: keyof ComponentDraft, value: string) => {
@@ -77,20 +77,30 @@ export default function Profile() {
 
     const fetchCircuits = async () => {
       try {
-        const response2 = await fetch("http://127.0.0.1:8000/simulate/list", {
-          method: "GET",
-          headers: {
-            Authorization: `Bearer ${token}`,
-            "Content-Type": "application/json",
-          },
-        });
-
-        if (!response2.ok) {
-          throw new Error(`HTTP error! status: ${response2.status}`);
-        }
-
-        const data2 = await response2.json();
-        setCircuitList(data2.circuits || []);
+        // /simulate/list is paginated: follow next_cursor until the last page
+        const circuits: Circuit[] = [];
+        let cursor: string | null = null;
+        do {
+          const url = cursor
+            ? `http://127.0.0.1:8000/simulate/list?cursor=${encodeURIComponent(cursor)}`
+            : "http://127.0.0.1:8000/simulate/list";
+          const response2 = await fetch(url, {
+            method: "GET",
+            headers: {
+              Authorization: `Bearer ${token}`,
+              "Content-Type": "application/json",
+            },
+          });
+
+          if (!response2.ok) {
+            throw new Error(`HTTP error! status: ${response2.status}`);
+          }
+
+          const data2 = await response2.json();
+          circuits.push(...(data2.circuits || []));
+          cursor = data2.next_cursor;
+        } while (cursor);
+        setCircuitList(circuits);
       } catch (error) {
         console.error("Error fetching circuits:", error);
         toast.error("Failed to fetch circuits.");